@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+from functions import (
+    Activity, Catalog, Currency, CurrencyDefinition, Energy, EnergyDefinition, IncrementalGameCog,
+    Player, Skill, SkillDefinition, Upgrade, UpgradeDefinition, create_game_schema
+)
+from database import Database
+
+# Benchmarks for the simulation and persistence hot paths. Runs on a synthetic
+# catalog and a temporary SQLite file, no Discord connection needed:
+#
+#   python benchmark.py                                       print the timings
+#   python benchmark.py --save-baseline benchmark_baseline.json  record this machine's numbers
+#   python benchmark.py --compare benchmark_baseline.json        fail on regressions against them
+#
+# Timings depend on the machine, so nothing is compared unless asked for and
+# no baseline is committed; benchmark_baseline.json is git-ignored. Every run
+# first checks Player.update against stepping energy cycles one by one.
+
+# A benchmark regresses when it is this many times slower than its baseline
+DEFAULT_THRESHOLD = 1.25
+
+# Each repeat runs at least this long, the fastest repeat is reported since
+# anything slower is noise from the rest of the machine
+MIN_REPEAT_TIME = 0.05
+REPEATS = 7
+
+UPGRADE_COUNT = 200
+SKILL_COUNT = 20
+ACTIVITY_COUNT = 20
+SAVE_BATCH = 50
+
+# Id of the one upgrade with passive energy recovery, only given to players
+# built with passive_recovery
+PASSIVE_UPGRADE_ID = UPGRADE_COUNT
+
+UPDATE_CHECK_GAPS = (timedelta(hours=1), timedelta(days=1), timedelta(days=7))
+# How far Player.update may end from stepping, see the comment in it
+UPDATE_TOLERANCE = 1e-4
+
+
+class SteppingPlayer(Player):
+    # Player.update without skipping whole energy cycles, the loop it replaced
+    __slots__ = ()
+
+    def energy_cycles(self, energy, activity, seconds):
+        return 0, None
+
+
+def synthetic_catalog(seed=0):
+    rng = random.Random(seed)
+
+    currencies = [Currency(CurrencyDefinition(0, 'coins', 10 ** 9))]
+    energies = [Energy(EnergyDefinition(0, 'energy', 100.0, 0.5))]
+
+    skills = [Skill(SkillDefinition(0, 'Stamina', 50.0, 1.2, 'Stamina', 'exponential', max_level=200, start_level=5,
+                                    effects={'energy.recovery_rate': {'modifier_type': 'increase', 'modifier_value': 0.01}}))]
+    for id in range(1, SKILL_COUNT):
+        skills.append(Skill(SkillDefinition(
+            id, f'Skill {id}', 10.0, 1.1, '', 'exponential', max_level=200,
+            effects={f'upgrade {rng.randrange(UPGRADE_COUNT)}.max_purchases': {'modifier_type': 'increase', 'modifier_value': 1.0}}
+        )))
+
+    upgrades = []
+    for id in range(UPGRADE_COUNT):
+        effect = rng.choice([
+            ('coins.capacity', 'increase', 10.0),
+            ('coins.gain', 'multiplier', 1.01),
+            ('energy.recovery_rate', 'increase', 0.01),
+            (f'upgrade {rng.randrange(UPGRADE_COUNT)}.max_purchases', 'increase', 1.0),
+            (f'upgrade {rng.randrange(UPGRADE_COUNT)}.effects', 'multiplier', 1.05),
+        ])
+        upgrades.append(Upgrade(UpgradeDefinition(
+            id, f'Upgrade {id}', 'coins', 10 * (id + 1), 100, f'Upgrade number {id}',
+            unlock_conditions=[f'level.skill {rng.randrange(1, SKILL_COUNT)}.{rng.randrange(1, 50)}'] if id % 3 == 0 else [],
+            unlocks=[f'unlock {id}'] if id % 10 == 0 else [],
+            effects={effect[0]: {'modifier_type': effect[1], 'modifier_value': effect[2]}}
+        )))
+
+    upgrades.append(Upgrade(UpgradeDefinition(
+        PASSIVE_UPGRADE_ID, 'Second wind', 'coins', 10, 1, 'Passive energy recovery',
+        effects={'energy.energy_passive_recovery': {'modifier_type': 'increase', 'modifier_value': 0.1}}
+    )))
+
+    activities = []
+    for id in range(ACTIVITY_COUNT):
+        activities.append(Activity(
+            id, f'Activity {id}', '', 'coins', 1.0 + id, 'energy', 0.1 * (id + 1), skills[id % SKILL_COUNT], 0.5,
+            (f'unlock {id * 10 % UPGRADE_COUNT}',) if id % 2 else (), f'Activity number {id}', f'Doing activity {id}'
+        ))
+
+    def by_id(objects):
+        return {obj.id: obj for obj in objects}
+
+    return Catalog(by_id(currencies), by_id(upgrades), by_id(skills), by_id(energies), by_id(activities))
+
+
+def synthetic_player(catalog, player_id, seed=0, player_class=Player, passive_recovery=False):
+    rng = random.Random(seed)
+    player = player_class(player_id, f'player{player_id}')
+
+    player.add_currency(catalog.currencies[0].copy())
+    player.add_energy(catalog.energies[0].copy())
+    for skill in catalog.skills.values():
+        skill = skill.copy()
+        skill.add_experience(skill.definition.exp_table[rng.randrange(20, 60)])
+        player.add_skill(skill)
+    for upgrade in catalog.upgrades.values():
+        if upgrade.id != PASSIVE_UPGRADE_ID:
+            player.add_upgrade(upgrade, rng.randrange(1, 60))
+    if passive_recovery:
+        player.add_upgrade(catalog.upgrades[PASSIVE_UPGRADE_ID])
+
+    player.currencies[0].set_amount(10 ** 6)
+    player.current_activity = catalog.activities[1]
+    return player
+
+
+def update_state(player):
+    state = {}
+    for energy in player.energies.values():
+        state[f'{energy.name} energy'] = energy.current_energy
+    for currency in player.currencies.values():
+        state[f'{currency.name} amount'] = currency.amount
+    for skill in player.skills.values():
+        state[f'{skill.name} level'] = skill.current_level
+        state[f'{skill.name} exp'] = skill.current_exp
+    return state
+
+
+def check_update(catalog):
+    # Player.update applies whole energy cycles at once and has to end where
+    # stepping them does, with and without passive recovery. The activity
+    # skill is swapped for one that maxes out after a few cycles, experience
+    # past max_level is dropped after the cycle that reaches it.
+    cog = IncrementalGameCog(None)
+    cog.catalog = catalog
+
+    mismatches = []
+    for passive_recovery in (False, True):
+        for gap in UPDATE_CHECK_GAPS:
+            states = []
+            for player_class in (Player, SteppingPlayer):
+                player = synthetic_player(catalog, 0, player_class=player_class, passive_recovery=passive_recovery)
+                cog.recalculate_player_modifiers(player)
+                player.add_skill(Skill(SkillDefinition(player.current_activity.skill.id, 'Check skill', 1000.0, 1.0, '', 'exponential', max_level=3)))
+                player.update(player.last_update_time + gap)
+                states.append(update_state(player))
+
+            skipped, stepped = states
+            for key, value in stepped.items():
+                if not math.isclose(skipped[key], value, rel_tol=UPDATE_TOLERANCE, abs_tol=UPDATE_TOLERANCE):
+                    mismatches.append(f"{key} after {gap}{' with passive recovery' if passive_recovery else ''}: "
+                                      f"{skipped[key]} instead of {value}")
+
+    return mismatches
+
+
+def measure(call):
+    # Grow the call count until one repeat takes long enough to time
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_REPEAT_TIME:
+            break
+        number *= 2
+
+    timings = [elapsed / number]
+    for _ in range(REPEATS - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        timings.append((time.perf_counter() - start) / number)
+
+    return min(timings)
+
+
+async def measure_async(call):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            await call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_REPEAT_TIME:
+            break
+        number *= 2
+
+    timings = [elapsed / number]
+    for _ in range(REPEATS - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            await call()
+        timings.append((time.perf_counter() - start) / number)
+
+    return min(timings)
+
+
+async def run_benchmarks(selected, catalog):
+    results = {}
+
+    with tempfile.TemporaryDirectory() as folder:
+        location = os.path.join(folder, 'game.db')
+        await create_game_schema(location)
+
+        cog = IncrementalGameCog(None)
+        cog.catalog = catalog
+        cog.game_db = Database(location, readers=1)
+        await cog.game_db.open()
+
+        players = [synthetic_player(catalog, player_id, seed=player_id) for player_id in range(SAVE_BATCH)]
+        for player in players:
+            cog.recalculate_player_modifiers(player)
+        await cog.players_to_database_update(players)
+        player = players[0]
+        passive_player = synthetic_player(catalog, SAVE_BATCH, passive_recovery=True)
+        cog.recalculate_player_modifiers(passive_player)
+        cog.render_fragments()
+
+        def update(gap, player=player):
+            def call():
+                player.update(player.last_update_time + gap)
+            return call
+
+        def recalculate():
+            player.modifier_signature = None
+            cog.recalculate_player_modifiers(player)
+
+        async def save_batch():
+            for batch_player in players:
+                batch_player.currencies[0].amount += 1
+                batch_player.upgrades[0].count += 1
+            await cog.players_to_database_update(players)
+
+        async def cold_load():
+            await cog.get_player_from_db(player.id)
+
+        benchmarks = {
+            'update_short_gap': update(timedelta(seconds=5)),
+            'update_long_gap': update(timedelta(days=30)),
+            'update_long_gap_passive': update(timedelta(days=30), passive_player),
+            'recalculate_modifiers': recalculate,
+            'players_to_database_update': save_batch,
+            'get_player_from_db': cold_load,
+            'stats_embed': lambda: cog.player_stats_embed_message(player),
+            'shop_embed': lambda: cog.render_shop_embed(player, 2),
+            'activities_embed': lambda: cog.render_activities_embed(player, 2),
+            'shop_embed_cached': lambda: cog.player_shop_embed_message(player, 2),
+            'activities_embed_cached': lambda: cog.player_activities_embed_message(player, 2),
+        }
+
+        for name, benchmark in benchmarks.items():
+            if selected and not any(part in name for part in selected):
+                continue
+
+            if asyncio.iscoroutinefunction(benchmark):
+                results[name] = await measure_async(benchmark)
+            else:
+                results[name] = measure(benchmark)
+
+        await cog.game_db.close()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the game simulation and persistence hot paths.')
+    parser.add_argument('benchmarks', nargs='*', help='only run benchmarks whose name contains one of these')
+    parser.add_argument('--save-baseline', metavar='FILE', help='write the results to FILE')
+    parser.add_argument('--compare', metavar='FILE', help='compare against the baseline in FILE')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='slowdown ratio that counts as a regression')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        if not os.path.exists(args.compare):
+            parser.error(f"no baseline at {args.compare}, record one with --save-baseline first")
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+
+    catalog = synthetic_catalog()
+
+    mismatches = check_update(catalog)
+    for mismatch in mismatches:
+        print(f"Player.update differs from stepping: {mismatch}")
+    if mismatches:
+        return 1
+
+    results = asyncio.run(run_benchmarks(args.benchmarks, catalog))
+
+    regressions = []
+    print(f"{'benchmark':<28}{'time':>12}{'baseline':>12}{'ratio':>8}")
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        ratio = seconds / base if base else None
+        if ratio and ratio > args.threshold:
+            regressions.append(name)
+        print(f"{name:<28}{seconds * 1e6:>10.1f}us"
+              f"{f'{base * 1e6:>10.1f}us' if base else '-':>12}"
+              f"{f'{ratio:.2f}' if ratio else '-':>8}"
+              f"{'  REGRESSION' if name in regressions else ''}")
+
+    if args.save_baseline:
+        # Keep the other benchmarks' entries when only some of them ran
+        saved = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline, encoding='utf-8') as file:
+                saved = json.load(file)
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump({**saved, **results}, file, indent=4, sort_keys=True)
+        print(f"Baseline saved to {args.save_baseline}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than {args.threshold}x baseline: {', '.join(regressions)}")
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import time
+
+
+class LRUCache(MutableMapping):
+    # Dict with a size limit and an idle timeout. Entries are kept in order of
+    # last use; get() and assignment count as use, plain indexing does not.
+    # on_evict(key, value) runs for every entry pushed out by size or age.
+    # Expired entries go on get(), assignment or an explicit evict(); `in`
+    # and plain indexing still see them until then.
+    def __init__(self, max_size, ttl=None, on_evict=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, key):
+        return self.entries[key][0]
+
+    def __setitem__(self, key, value):
+        self.entries[key] = (value, time.monotonic())
+        self.entries.move_to_end(key)
+        self.evict()
+
+    def __delitem__(self, key):
+        del self.entries[key]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None or self.is_expired(entry):
+            if entry is not None:
+                self.evict_entry(key)
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.entries[key] = (entry[0], time.monotonic())
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def is_expired(self, entry, now=None):
+        if self.ttl is None:
+            return False
+        return (now or time.monotonic()) - entry[1] > self.ttl
+
+    def evict(self):
+        while len(self.entries) > self.max_size:
+            self.evict_entry(next(iter(self.entries)))
+
+        # Oldest first, so stop at the first entry that is still fresh
+        now = time.monotonic()
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if not self.is_expired(entry, now):
+                break
+            self.evict_entry(key)
+
+    def evict_entry(self, key):
+        value, _ = self.entries.pop(key)
+        self.evictions += 1
+        if self.on_evict:
+            self.on_evict(key, value)
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
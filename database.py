@@ -0,0 +1,180 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+import aiosqlite
+from typing import Any, Optional
+
+# Applied to every connection when it is opened. WAL lets the readers keep
+# working while the writer commits, and NORMAL sync is safe under WAL.
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -8000',
+)
+
+# sqlite3 keeps this many prepared statements per connection, so repeated
+# queries on a long-lived connection skip the parse/prepare step.
+CACHED_STATEMENTS = 256
+
+
+class Database:
+    def __init__(self, location, readers=2):
+        self.location = location
+        self.reader_count = readers
+        self.writer: Optional[aiosqlite.Connection] = None
+        self.readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self.write_lock = asyncio.Lock()
+        self.is_open = False
+
+        # Time spent waiting for a free reader, and for the write lock plus
+        # SQLite's own lock on BEGIN IMMEDIATE. Load tests report these.
+        self.read_waits = 0
+        self.read_wait_seconds = 0.0
+        self.write_waits = 0
+        self.write_wait_seconds = 0.0
+
+    async def open(self):
+        if self.is_open:
+            return
+
+        self.writer = await self.connect()
+        for _ in range(self.reader_count):
+            reader = await self.connect()
+            await reader.execute('PRAGMA query_only = ON')
+            self.readers.put_nowait(reader)
+
+        self.is_open = True
+
+    async def connect(self):
+        # isolation_level=None: transactions are only opened by transaction(),
+        # reads never hold a snapshot open between calls.
+        db = await aiosqlite.connect(self.location, isolation_level=None, cached_statements=CACHED_STATEMENTS)
+        for pragma in CONNECTION_PRAGMAS:
+            await db.execute(pragma)
+        return db
+
+    async def close(self):
+        if not self.is_open:
+            return
+
+        self.is_open = False
+
+        async with self.write_lock:
+            await self.writer.close()
+            self.writer = None
+
+        for _ in range(self.reader_count):
+            reader = await self.readers.get()
+            await reader.close()
+
+    @asynccontextmanager
+    async def read(self):
+        start = time.perf_counter()
+        reader = await self.readers.get()
+        self.read_waits += 1
+        self.read_wait_seconds += time.perf_counter() - start
+        try:
+            yield reader
+        finally:
+            self.readers.put_nowait(reader)
+
+    @asynccontextmanager
+    async def transaction(self):
+        start = time.perf_counter()
+        async with self.write_lock:
+            db = self.writer
+            try:
+                # Inside the try: if the caller is cancelled while BEGIN is
+                # queued, it still runs, and the rollback queued after it
+                # must undo it
+                await db.execute('BEGIN IMMEDIATE')
+                self.write_waits += 1
+                self.write_wait_seconds += time.perf_counter() - start
+                yield db
+            except BaseException:
+                await db.rollback()
+                raise
+            else:
+                await db.commit()
+
+
+class WriteBehindQueue:
+    # Collects items to save and writes them in batches from a background
+    # task. Marking the same key again before a flush replaces the pending
+    # entry, so many saves of one player cost a single write.
+    def __init__(self, flush_callback, interval=5.0, batch_size=50):
+        self.flush_callback = flush_callback
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pending: dict[Any, Any] = {}
+        # The batch being written right now. Until it commits, the database
+        # still has the old rows, so lookups must see these items too.
+        self.in_flight: dict[Any, Any] = {}
+        self.wake = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+        await self.flush()
+
+    def mark_dirty(self, key, item):
+        self.pending[key] = item
+        if len(self.pending) >= self.batch_size:
+            self.wake.set()
+
+    def is_pending(self, key):
+        return key in self.pending
+
+    def get(self, key):
+        # Newest unsaved copy of an item: marked since the last flush first,
+        # then the batch still being written
+        item = self.pending.get(key)
+        if item is None:
+            item = self.in_flight.get(key)
+        return item
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+            try:
+                await self.flush()
+            except Exception as error:
+                print(f"Saving {len(self.pending)} pending items failed, retrying later: {error!r}")
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending:
+                return
+
+            batch = self.pending
+            self.pending = {}
+            self.in_flight = batch
+
+            try:
+                await self.flush_callback(list(batch.values()))
+            except BaseException:
+                # Anything marked again meanwhile is newer, keep that instead
+                for key, item in batch.items():
+                    self.pending.setdefault(key, item)
+                raise
+            finally:
+                self.in_flight = {}
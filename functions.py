@@ -1,14 +1,23 @@
 from __future__ import annotations
 from discord.ext import commands
 from datetime import datetime
+from contextlib import contextmanager
+import asyncio
+import time
 import discord
 import aiosqlite
 import math
 import json
 import os
-from views import ShopMenuView, MainMenuView, ActivitiesMenuView
+from views import GameButton, ShopMenuView, MainMenuView, ActivitiesMenuView
+from database import Database, WriteBehindQueue
+from cache import LRUCache
+from scheduler import EventScheduler
+from metrics import Metrics, start_metrics_server
 from typing import Optional, Any
-from copy import deepcopy
+from operator import attrgetter
+from bisect import bisect_right
+from types import MappingProxyType
 
 tree = None
 
@@ -26,28 +35,130 @@ ACTIVITIES_PER_PAGE = 5
 
 UPGRADES_PER_PAGE = 4
 
+# Player saves are written behind, at most this many seconds after a change
+SAVE_INTERVAL = 5
+
+# Flush early once this many players are waiting to be saved
+SAVE_BATCH_SIZE = 50
+
+# Resident players, least recently active are dropped first
+PLAYER_CACHE_SIZE = 1000
+
+# Seconds without activity before a player is dropped from memory
+PLAYER_CACHE_TTL = 60 * 60
+
+# Rendered shop and activity embeds kept for reuse, one per player and page
+EMBED_CACHE_SIZE = 1000
+
+# Player.update skips steps shorter than this, so events are never
+# scheduled closer together
+MIN_EVENT_DELAY = 1
+
+# Seconds between checks for edited game_data files, 0 leaves reloading to
+# the reload_catalog command
+CATALOG_WATCH_INTERVAL = float(os.getenv('CATALOG_WATCH_INTERVAL', 0))
+
+# Seconds between batch ticks that advance and save every resident player,
+# keeping the database current for anything reading it across players. 0
+# leaves it to the players' own events and to shutdown.
+BATCH_TICK_INTERVAL = float(os.getenv('BATCH_TICK_INTERVAL', 0))
+
+CATALOG_FILES = ('currencies.json', 'energies.json', 'skills.json', 'upgrades.json', 'activities.json')
+
+# Port for the Prometheus /metrics endpoint on localhost, 0 leaves it off and
+# the numbers are only available through !stats
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+# Interaction and database latencies, see metrics.py
+metrics = Metrics()
+
+PLAYER_ROW_UPSERTS = {
+    'players': '''
+        INSERT INTO players (player_id, player_display_name, start_date, last_update_time)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (player_id) DO UPDATE SET
+            player_display_name = excluded.player_display_name,
+            start_date = excluded.start_date,
+            last_update_time = excluded.last_update_time''',
+    'player_upgrades': '''
+        INSERT INTO player_upgrades (player_id, upgrade_id, count)
+        VALUES (?, ?, ?)
+        ON CONFLICT (player_id, upgrade_id) DO UPDATE SET count = excluded.count''',
+    'player_currencies': '''
+        INSERT INTO player_currencies (player_id, currency_id, amount)
+        VALUES (?, ?, ?)
+        ON CONFLICT (player_id, currency_id) DO UPDATE SET amount = excluded.amount''',
+    'player_skills': '''
+        INSERT INTO player_skills (player_id, skill_id, current_level, current_exp)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (player_id, skill_id) DO UPDATE SET
+            current_level = excluded.current_level,
+            current_exp = excluded.current_exp''',
+    'player_activities': '''
+        INSERT INTO player_activities (player_id, activity_id)
+        VALUES (?, ?)
+        ON CONFLICT (player_id, activity_id) DO NOTHING''',
+    'player_energies': '''
+        INSERT INTO player_energies (player_id, energy_id, current_energy)
+        VALUES (?, ?, ?)
+        ON CONFLICT (player_id, energy_id) DO UPDATE SET current_energy = excluded.current_energy''',
+}
+
+PLAYER_ROW_DELETES = {
+    'player_upgrades': 'DELETE FROM player_upgrades WHERE player_id = ? AND upgrade_id = ?',
+    'player_currencies': 'DELETE FROM player_currencies WHERE player_id = ? AND currency_id = ?',
+    'player_skills': 'DELETE FROM player_skills WHERE player_id = ? AND skill_id = ?',
+    'player_activities': 'DELETE FROM player_activities WHERE player_id = ? AND activity_id = ?',
+    'player_energies': 'DELETE FROM player_energies WHERE player_id = ? AND energy_id = ?',
+}
+
+
+def compile_effects(effects: dict[str, dict[str, Any]]):
+    # Effect definitions resolved once into (stat, target, attribute,
+    # modifier_type, modifier_value) so recalculating never parses keys.
+    modifiers = []
+    for stat, effect in effects.items():
+        target, attribute = stat.split('.')
+        modifiers.append((stat, target.lower(), attribute, effect['modifier_type'], effect['modifier_value']))
+
+    return tuple(modifiers)
+
+
+def definition_field(name):
+    # Read-only view of a field on the shared definition
+    return property(attrgetter('definition.' + name))
+
+
+class EnergyDefinition:
+    __slots__ = ('id', 'name', 'max_energy', 'recovery_rate')
 
-class Energy:
     def __init__(self, id, name, max_energy, recovery_rate=0.2):
         self.id = id
         self.name = name
         self.max_energy = max_energy
-        self.base_max_energy = max_energy
-        self.current_energy = max_energy
         self.recovery_rate = recovery_rate
-        self.base_recovery_rate = recovery_rate
+
+
+class Energy:
+    # Definitions hold the static data and are shared by the catalog entry and
+    # every player's copy; the slots below are the per-player state.
+    __slots__ = ('definition', 'max_energy', 'current_energy', 'recovery_rate', 'energy_passive_recovery', 'recovering')
+
+    id = definition_field('id')
+    name = definition_field('name')
+    base_max_energy = definition_field('max_energy')
+    base_recovery_rate = definition_field('recovery_rate')
+
+    def __init__(self, definition: EnergyDefinition):
+        self.definition = definition
+        self.max_energy = definition.max_energy
+        self.current_energy = definition.max_energy
+        self.recovery_rate = definition.recovery_rate
         self.energy_passive_recovery = 0
         self.recovering = False
 
     def copy(self):
-        new_energy = Energy(
-            id=self.id,
-            name=self.name,
-            max_energy=self.max_energy,
-            recovery_rate=self.recovery_rate
-        )
-
-        return new_energy
+        return Energy(self.definition)
 
     def is_not_full(self):
         return self.max_energy > self.current_energy
@@ -81,15 +192,21 @@ class Energy:
         # return amount of used from amount
         return start_energy - self.current_energy
 
+    def row(self):
+        return (self.current_energy,)
+
     def __str__(self):
         return f"Energy: {format_number(self.current_energy)}/{format_number(self.max_energy)} - Recovery Rate: {format_number(self.base_recovery_rate)}" \
             f"{f' `+{format_number(self.recovery_rate - self.base_recovery_rate)}`' if self.recovery_rate > self.base_recovery_rate else ''}"
 
 
-class Skill:
+class SkillDefinition:
+    __slots__ = ('id', 'name', 'base_exp_requirement', 'scaling_factor', 'description', 'exp_formula',
+                 'max_level', 'start_level', 'effects', 'modifiers', 'exp_table', 'exp_table_sorted')
+
     def __init__(self, id, name, base_exp_requirement,
                  scaling_factor, description, exp_formula, max_level=50,
-                 start_level=1, current_exp=0):
+                 start_level=1, effects=None):
         self.id = id
         self.name = name
         self.base_exp_requirement = base_exp_requirement
@@ -98,53 +215,90 @@ class Skill:
         self.exp_formula = exp_formula
         self.max_level = max_level
         self.start_level = start_level
-        self.current_level = start_level
+        self.effects: dict[str, dict[str, Any]] = effects or {}
+        self.modifiers = compile_effects(self.effects)
+
+        # Experience needed to leave each level, indexed from start_level.
+        # current_exp is a running total, so these are the totals to reach.
+        self.exp_table = tuple(self.exp_requirement(level) for level in range(start_level, max_level))
+        self.exp_table_sorted = all(a <= b for a, b in zip(self.exp_table, self.exp_table[1:]))
+
+    def exp_requirement(self, level):
+        try:
+            return self.base_exp_requirement * (self.scaling_factor ** (level - self.start_level))
+        except OverflowError:
+            return math.inf
+
+
+class Skill:
+    __slots__ = ('definition', 'current_level', 'current_exp', 'exp_passive_gain', 'last_gained')
+
+    id = definition_field('id')
+    name = definition_field('name')
+    base_exp_requirement = definition_field('base_exp_requirement')
+    scaling_factor = definition_field('scaling_factor')
+    description = definition_field('description')
+    exp_formula = definition_field('exp_formula')
+    max_level = definition_field('max_level')
+    start_level = definition_field('start_level')
+    effects = definition_field('effects')
+    modifiers = definition_field('modifiers')
+
+    def __init__(self, definition: SkillDefinition, current_exp=0):
+        self.definition = definition
+        self.current_level = definition.start_level
         self.current_exp = current_exp
         self.exp_passive_gain = 0
         self.last_gained = 0
-        self.effects: dict[str, dict[str, Any]] = {}
 
     def copy(self):
-        new_skill = Skill(
-            id=self.id,
-            name=self.name,
-            base_exp_requirement=self.base_exp_requirement,
-            scaling_factor=self.scaling_factor,
-            description=self.description,
-            exp_formula=self.exp_formula,
-            max_level=self.max_level,
-            start_level=self.start_level,
-            current_exp=self.current_exp
-        )
-
-        new_skill.effects = self.effects.copy()
-
-        return new_skill
+        return Skill(self.definition, current_exp=self.current_exp)
 
     def exp_required_for_next_level(self):
         if self.current_level >= self.max_level:
             return 0
 
-        return self.base_exp_requirement * (self.scaling_factor ** (self.current_level - self.start_level))
+        return self.definition.exp_table[self.current_level - self.start_level]
 
     def add_experience(self, experience_amount):
-        levelled_up = False
-
         if self.current_level >= self.max_level:
             return False
 
         self.current_exp += experience_amount
+        previous_level = self.current_level
+
+        definition = self.definition
+        if definition.exp_table_sorted:
+            # First level at or above the current one whose requirement isn't
+            # met yet, however many levels the grant covers
+            self.current_level = definition.start_level + bisect_right(
+                definition.exp_table, self.current_exp, lo=self.current_level - definition.start_level)
+        else:
+            while self.current_level < self.max_level and self.current_exp >= self.exp_required_for_next_level():
+                self.current_level += 1
+
+        return self.current_level > previous_level
+
+    def add_repeated_experience(self, experience_amount, count):
+        # Same as calling add_experience count times: the grant that reaches
+        # max_level is kept whole and the ones after it are dropped
+        if count < 1 or self.current_level >= self.max_level:
+            return False
 
-        while self.current_level < self.max_level and self.current_exp >= self.exp_required_for_next_level():
-            self.current_level += 1
-            levelled_up = True
+        if experience_amount > 0:
+            needed = max(self.definition.exp_table[self.current_level - self.start_level:]) - self.current_exp
+            if math.isfinite(needed):
+                count = min(count, max(math.ceil(needed / experience_amount), 1))
 
-        return levelled_up
+        return self.add_experience(experience_amount * count)
 
     def passive_gain(self, seconds):
         if self.exp_passive_gain > 0:
             self.add_experience(self.exp_passive_gain * seconds)
 
+    def row(self):
+        return (self.current_level, self.current_exp)
+
     def __str__(self):
         last_gained_text = f' (+{format_number(self.last_gained)})' if self.last_gained > 0 else ''
         return f'{self.name}: Level {self.current_level}/{self.max_level} - Exp: {format_number(self.current_exp)}/{format_number(self.exp_required_for_next_level())}' \
@@ -152,13 +306,18 @@ class Skill:
 
 
 class Activity:
+    # Activities have no per-player state, players point at the catalog entry
+    __slots__ = ('id', 'name', 'icon', 'output_item', 'output_amount', 'energy_type', 'energy_drain_rate',
+                 'skill', 'skill_exp_rate', 'unlock_conditions', 'description', 'status_description',
+                 'currency_id', 'energy_id', 'skill_id', 'gain_stat')
+
     def __init__(self, id: int, name: str, icon: str,
                  output_item: str, output_amount: float,
                  energy_type: str,
                  energy_drain_rate: float,
                  skill: Optional[Skill],
                  skill_exp_rate: float,
-                 unlock_conditions: list[str], description: str,
+                 unlock_conditions: tuple[str, ...], description: str,
                  status_description: str):
         self.id = id
         self.name = name
@@ -172,48 +331,51 @@ class Activity:
         self.unlock_conditions = unlock_conditions
         self.description = description
         self.status_description = status_description
-
-    def copy(self):
-        new_activity = Activity(
-            id=self.id,
-            name=self.name,
-            icon=self.icon,
-            output_item=self.output_item,
-            output_amount=self.output_amount,
-            energy_type=self.energy_type,
-            energy_drain_rate=self.energy_drain_rate,
-            skill=self.skill,
-            skill_exp_rate=self.skill_exp_rate,
-            unlock_conditions=self.unlock_conditions[:],
-            description=self.description,
-            status_description=self.status_description
-        )
-
-        return new_activity
+        # Filled in by bind() when the catalog is built
+        self.currency_id: Optional[int] = None
+        self.energy_id: Optional[int] = None
+        self.skill_id: Optional[int] = skill.id if skill else None
+        self.gain_stat = f"{output_item}.gain"
+
+    def bind(self, catalog):
+        # Resolve output_item and energy_type to ids once, players look up
+        # their own copies by id. None when the name matches nothing.
+        currency = catalog.currencies_by_name.get(self.output_item.lower()) if self.output_item else None
+        energy = catalog.energies_by_name.get(self.energy_type.lower()) if self.energy_type else None
+        self.currency_id = currency.id if currency else None
+        self.energy_id = energy.id if energy else None
 
     def __str__(self):
         return f'{self.description}'
 
 
-class Currency:
+class CurrencyDefinition:
+    __slots__ = ('id', 'name', 'capacity')
+
     def __init__(self, id, name, capacity):
         self.id = id
         self.name = name
-        self.amount = 0
         self.capacity = capacity
-        self.base_capacity = capacity
+
+
+class Currency:
+    __slots__ = ('definition', 'amount', 'capacity', 'last_gained', 'currency_passive_gain')
+
+    id = definition_field('id')
+    name = definition_field('name')
+    base_capacity = definition_field('capacity')
+
+    def __init__(self, definition: CurrencyDefinition):
+        self.definition = definition
+        self.amount = 0
+        self.capacity = definition.capacity
         self.last_gained = 0
         self.currency_passive_gain = 0
 
     def copy(self):
-        new_currency = Currency(
-            self.id,
-            self.name,
-            self.capacity
-        )
+        new_currency = Currency(self.definition)
 
         new_currency.amount = self.amount
-        new_currency.base_capacity = self.base_capacity
         new_currency.last_gained = self.last_gained
 
         return new_currency
@@ -231,46 +393,66 @@ class Currency:
         if self.currency_passive_gain > 0:
             self.add_amount(seconds * self.currency_passive_gain)
 
+    def row(self):
+        return (self.amount,)
+
     def __str__(self):
         return f"{self.name}: {format_number(self.amount)}/{format_number(self.capacity)} " \
             f"{f'(+{format_number(self.last_gained)})' if self.last_gained > 0 else ''}"
 
 
-class Upgrade:
+class UpgradeDefinition:
+    __slots__ = ('id', 'name', 'cost_material', 'cost', 'max_purchases', 'description',
+                 'unlock_conditions', 'unlocks', 'effects', 'modifiers')
+
     def __init__(self, id, name, cost_material, cost,
-                 max_purchases, description):
+                 max_purchases, description, unlock_conditions=(), unlocks=(), effects=None):
         self.id = id
         self.name = name
         self.cost_material = cost_material
         self.cost = cost
-        self.count = 1
         self.max_purchases = max_purchases
-        self.unlock_conditions = []
-        self.unlocks = []
         self.description = description
-        self.effects: dict[str, dict[str, Any]] = {}
+        self.unlock_conditions: tuple[str, ...] = tuple(unlock_conditions)
+        self.unlocks: tuple[str, ...] = tuple(unlocks)
+        self.effects: dict[str, dict[str, Any]] = effects or {}
+        self.modifiers = compile_effects(self.effects)
 
-    def copy(self):
-        new_upgrade = Upgrade(
-            self.id,
-            self.name,
-            self.cost_material,
-            self.cost,
-            self.max_purchases,
-            self.description
-        )
 
-        new_upgrade.unlock_conditions = self.unlock_conditions[:]
-        new_upgrade.unlocks = self.unlocks[:]
-        new_upgrade.effects = self.effects.copy()
+class Upgrade:
+    __slots__ = ('definition', 'count', 'max_purchases')
+
+    id = definition_field('id')
+    name = definition_field('name')
+    cost_material = definition_field('cost_material')
+    cost = definition_field('cost')
+    description = definition_field('description')
+    unlock_conditions = definition_field('unlock_conditions')
+    unlocks = definition_field('unlocks')
+    effects = definition_field('effects')
+    modifiers = definition_field('modifiers')
+
+    def __init__(self, definition: UpgradeDefinition):
+        self.definition = definition
+        self.count = 1
+        self.max_purchases = definition.max_purchases
 
-        return new_upgrade
+    def copy(self):
+        return Upgrade(self.definition)
+
+    def row(self):
+        return (self.count,)
 
     def __str__(self):
         return f'{self.name if self.count == 1 else self.name + " __x" + str(self.count) + "__"}'
 
 
 class Player:
+    __slots__ = ('id', 'title', 'display_name', 'currencies', 'upgrades', 'skills', 'energies', 'stat_modifiers',
+                 'unlock_conditions', 'last_update_time', 'current_activity', 'time_since_last_update', 'start_date',
+                 'modifier_signature', 'modifier_targets', 'saved_rows', 'shop_state', 'activities_state',
+                 'currencies_by_name', 'upgrades_by_name', 'skills_by_name', 'energies_by_name')
+
     def __init__(self, player_id: int, display_name: str):
         self.id = player_id
         self.title = 'Beggar'
@@ -279,28 +461,52 @@ class Player:
         self.upgrades: dict[int, Upgrade] = {}
         self.skills: dict[int, Skill] = {}
         self.energies: dict[int, Energy] = {}
+        # The same objects by lowercased name, kept in step by the add_*
+        # methods; anything that replaces objects directly calls index_names()
+        self.currencies_by_name: dict[str, Currency] = {}
+        self.upgrades_by_name: dict[str, Upgrade] = {}
+        self.skills_by_name: dict[str, Skill] = {}
+        self.energies_by_name: dict[str, Energy] = {}
         self.stat_modifiers: dict[str, dict[str, float]] = {}
-        self.unlock_conditions = []
+        # Unlocks granted by owned upgrades. Only replaced when it changes, so
+        # its identity tells whether the available activities need a rebuild.
+        self.unlock_conditions: frozenset[str] = frozenset()
         self.last_update_time = datetime.now()
         self.current_activity: Optional[Activity] = None
         self.time_since_last_update = 0
         self.start_date = datetime.now()
+        # Owned upgrade counts and skill levels the modifiers were built from
+        self.modifier_signature = None
+        # stat_modifiers grouped by target name, as (attribute, modifier)
+        self.modifier_targets: dict[str, list[tuple[str, dict[str, float]]]] = {}
+        # Rows as they were last written to the database, per table and id
+        self.saved_rows: dict[str, dict[int, tuple]] = {}
+        # What the menus offer, see IncrementalGameCog.get_shop_state and
+        # get_activities_state
+        self.shop_state: Optional[ShopState] = None
+        self.activities_state: Optional[MenuState] = None
+
+    def index_names(self):
+        self.currencies_by_name = {currency.name.lower(): currency for currency in self.currencies.values()}
+        self.upgrades_by_name = {upgrade.name.lower(): upgrade for upgrade in self.upgrades.values()}
+        self.skills_by_name = {skill.name.lower(): skill for skill in self.skills.values()}
+        self.energies_by_name = {energy.name.lower(): energy for energy in self.energies.values()}
 
     def add_skill(self, skill: Skill):
         self.skills[skill.id] = skill
+        self.skills_by_name[skill.name.lower()] = skill
 
     def buy_upgrade(self, upgrade:  Upgrade, count=1):
-        new_upgrade = upgrade.copy()
-        material_type = new_upgrade.cost_material
-        cost = new_upgrade.cost
+        material_type = upgrade.cost_material
+        cost = upgrade.cost
 
-        currency = next((currency for currency in self.currencies.values() if currency.name == material_type), None)
+        currency = self.currencies_by_name.get(material_type.lower())
 
         if currency and currency.amount >= cost * count:
             if upgrade.id in self.upgrades:
                 owned_upgrade = self.upgrades[upgrade.id]
                 if owned_upgrade.count + count <= owned_upgrade.max_purchases:
-                    self.add_upgrade(new_upgrade, count)
+                    self.add_upgrade(upgrade, count)
                     currency.amount -= cost
             else:
                 if count <= upgrade.max_purchases:
@@ -311,11 +517,13 @@ class Player:
         energy_id = energy.id
         if energy_id not in self.energies:
             self.energies[energy_id] = energy
+            self.energies_by_name[energy.name.lower()] = energy
 
     def add_currency(self, currency: Currency):
         currency_id = currency.id
         if currency_id not in self.currencies:
             self.currencies[currency_id] = currency
+            self.currencies_by_name[currency.name.lower()] = currency
 
     def add_upgrade(self, upgrade:  Upgrade, count=1):
         if count < 1:
@@ -328,127 +536,119 @@ class Player:
         else:
             new_upgrade.count = count
             self.upgrades[upgrade_id] = new_upgrade
+            self.upgrades_by_name[new_upgrade.name.lower()] = new_upgrade
 
         self.update_unlock_conditions()
 
     def update_unlock_conditions(self):
-        self.unlock_conditions = []
+        unlock_conditions = frozenset(unlock for upgrade in self.upgrades.values() for unlock in upgrade.unlocks)
+        if unlock_conditions != self.unlock_conditions:
+            self.unlock_conditions = unlock_conditions
 
-        for upgrade in self.upgrades.values():
-            if upgrade.unlocks:
-                self.unlock_conditions.extend(upgrade.unlocks)
+    def meets_level_conditions(self, level_conditions) -> bool:
+        for skill_id, required_level in level_conditions:
+            skill = self.skills.get(skill_id)
+            if not skill or skill.current_level < required_level:
+                return False
+
+        return True
 
     def recalculate_modifiers(self):
+        # Returns False when nothing the modifiers depend on has changed since
+        # the last call, in which case stat_modifiers is left as it was.
+        signature = (
+            tuple((id, upgrade.count) for id, upgrade in self.upgrades.items()),
+            tuple((id, skill.current_level) for id, skill in self.skills.items()),
+            tuple(self.currencies),
+            tuple(self.energies),
+        )
+        if signature == self.modifier_signature:
+            return False
+
+        self.modifier_signature = signature
         self.stat_modifiers = {}
 
+        # Upgrades that improve other upgrades' effects go first, and only
+        # their own effect values are used as-is
         priority_upgrades = [
             upgrade for upgrade in self.upgrades.values()
-            if any(effect_key.split('.')[1] == "effects" for effect_key in upgrade.effects.keys())
+            if any(attribute == 'effects' for _, _, attribute, _, _ in upgrade.modifiers)
         ]
 
         for upgrade in priority_upgrades:
-            for stat, effect in upgrade.effects.items():
-                modifier_type = effect['modifier_type']
-                modifier_value = effect['modifier_value']
-
-                for _ in range(upgrade.count):
-                    if stat not in self.stat_modifiers:
-                        self.stat_modifiers[stat] = {'increase': 0, 'multiplier': 1.0}
-
-                    if modifier_type == 'multiplier':
-                        self.stat_modifiers[stat]['multiplier'] *= modifier_value
+            for stat, _, _, modifier_type, modifier_value in upgrade.modifiers:
+                self.add_stat_modifier(stat, modifier_type, modifier_value, upgrade.count)
 
-                    if modifier_type == 'increase':
-                        self.stat_modifiers[stat]['increase'] += modifier_value
-
-        self.apply_upgrade_modifiers()
+        effect_modifiers = {
+            stat.split('.')[0]: dict(stat_modifier) for stat, stat_modifier in self.stat_modifiers.items()
+            if stat.endswith('.effects')
+        }
 
         # Skills improving upgrades
         for skill in self.skills.values():
-            for stat, effect in skill.effects.items():
-                modifier_type = effect['modifier_type']
-                modifier_value = effect['modifier_value']
-
-                effect_count = skill.current_level - skill.start_level
-
-                for _ in range(effect_count):
-                    if stat not in self.stat_modifiers:
-                        self.stat_modifiers[stat] = {'increase': 0, 'multiplier': 1.0}
+            effect_count = skill.current_level - skill.start_level
 
-                    if modifier_type == 'multiplier':
-                        self.stat_modifiers[stat]['multiplier'] *= modifier_value
-
-                    if modifier_type == 'increase':
-                        self.stat_modifiers[stat]['increase'] += modifier_value
+            for stat, _, _, modifier_type, modifier_value in skill.modifiers:
+                self.add_stat_modifier(stat, modifier_type, modifier_value, effect_count)
 
         for upgrade in self.upgrades.values():
-            if upgrade not in priority_upgrades:
-                for stat, effect in upgrade.effects.items():
-                    modifier_type = effect['modifier_type']
-                    modifier_value = effect['modifier_value']
-
-                    for _ in range(upgrade.count):
-                        if stat not in self.stat_modifiers:
-                            self.stat_modifiers[stat] = {'increase': 0, 'multiplier': 1.0}
+            if upgrade in priority_upgrades:
+                continue
 
-                        if modifier_type == 'multiplier':
-                            self.stat_modifiers[stat]['multiplier'] *= modifier_value
+            effect_modifier = effect_modifiers.get(upgrade.name.lower())
 
-                        if modifier_type == 'increase':
-                            self.stat_modifiers[stat]['increase'] += modifier_value
+            for stat, _, _, modifier_type, modifier_value in upgrade.modifiers:
+                if effect_modifier:
+                    modifier_value = (modifier_value + effect_modifier['increase']) * effect_modifier['multiplier']
 
-    def apply_upgrade_modifiers(self):
-        for upgrade in self.upgrades.values():
-            for key, stat_modifier in self.stat_modifiers.items():
-                if key.startswith(upgrade.name.lower()):
-                    upgrade_name, attribute = key.split('.')
+                self.add_stat_modifier(stat, modifier_type, modifier_value, upgrade.count)
 
-                    if attribute == 'effects':
-                        upgrade_to_change = next((upgrade for upgrade in self.upgrades.values() if upgrade.name.lower() == upgrade_name.lower()), None)
-                        effects_dict = getattr(upgrade_to_change, attribute)
+        self.modifier_targets = {}
+        for stat, stat_modifier in self.stat_modifiers.items():
+            target, attribute = stat.split('.')
+            self.modifier_targets.setdefault(target.lower(), []).append((attribute, stat_modifier))
 
-                        for effect in effects_dict.values():
-                            if 'modifier_value' in effect:
-                                modifier_value = effect['modifier_value']
-
-                                new_value = (modifier_value + stat_modifier['increase']) * stat_modifier['multiplier']
+        return True
 
-                                effect['modifier_value'] = new_value
+    def add_stat_modifier(self, stat, modifier_type, modifier_value, count):
+        # Same as applying the modifier count times, in closed form
+        if count < 1:
+            return
 
-                                setattr(upgrade_to_change, attribute, effects_dict)
+        if stat not in self.stat_modifiers:
+            self.stat_modifiers[stat] = {'increase': 0, 'multiplier': 1.0}
 
-                    elif hasattr(upgrade, attribute):
-                        upgrade_attribute = getattr(upgrade, attribute)
+        if modifier_type == 'multiplier':
+            self.stat_modifiers[stat]['multiplier'] *= modifier_value ** count
 
-                        new_value = (upgrade_attribute + stat_modifier['increase']) * stat_modifier['multiplier']
+        if modifier_type == 'increase':
+            self.stat_modifiers[stat]['increase'] += modifier_value * count
 
-                        setattr(upgrade, attribute, new_value)
+    def apply_upgrade_modifiers(self):
+        for upgrade in self.upgrades.values():
+            self.apply_modifiers(upgrade)
 
     def apply_energy_modifiers(self):
         for energy in self.energies.values():
-            for key, stat_modifier in self.stat_modifiers.items():
-                if key.startswith(energy.name.lower()):
-                    _, attribute = key.split('.')
-
-                    if hasattr(energy, attribute):
-                        energy_attribute = getattr(energy, attribute)
-
-                        new_value = (energy_attribute + stat_modifier['increase']) * stat_modifier['multiplier']
-
-                        setattr(energy, attribute, new_value)
+            self.apply_modifiers(energy)
 
     def apply_currency_modifiers(self):
         for currency in self.currencies.values():
-            for key, stat_modifier in self.stat_modifiers.items():
-                if key.startswith(currency.name):
-                    _, attribute = key.split('.')
+            self.apply_modifiers(currency)
+
+    def apply_modifiers(self, target: Upgrade | Energy | Currency):
+        for attribute, stat_modifier in self.modifier_targets.get(target.name.lower(), ()):
+            # Only per-player state is modified, definitions are shared.
+            # Effect values are folded in by recalculate_modifiers, and
+            # validate_catalog_references rejects any other attribute.
+            if attribute not in target.__slots__:
+                continue
 
-                    if hasattr(currency, attribute):
-                        currency_attribute = getattr(currency, attribute)
+            target_attribute = getattr(target, attribute)
 
-                        new_value = (currency_attribute + stat_modifier['increase']) * stat_modifier['multiplier']
+            new_value = (target_attribute + stat_modifier['increase']) * stat_modifier['multiplier']
 
-                        setattr(currency, attribute, new_value)
+            setattr(target, attribute, new_value)
 
     def change_activity(self, activity: Activity):
         self.update(datetime.now())
@@ -462,11 +662,123 @@ class Player:
     def deplete_energy(self, energy: Energy, activity_steps):
         deplete_amount = energy.deplete(activity_steps)
 
-        if energy.name.lower() == 'energy':
-            self.skills[0].add_experience(deplete_amount)
+        self.gain_depletion_experience(energy, deplete_amount)
 
         return deplete_amount
 
+    def gain_depletion_experience(self, energy: Energy, deplete_amount, count=1):
+        if energy.name.lower() == 'energy':
+            self.skills[0].add_repeated_experience(deplete_amount, count)
+
+    def gain_activity_progress(self, activity: Activity, activity_skill: Optional[Skill], currency: Optional[Currency], activity_count, count=1):
+        # count repeats of the same activity_count, for whole energy cycles
+        if activity_skill:
+            if activity_skill.id not in self.skills:
+                activity_skill = activity_skill.copy()
+                self.add_skill(activity_skill)
+
+            activity_skill.add_repeated_experience(activity.skill_exp_rate * activity_count, count)
+
+        if currency:
+            amount_to_add = activity_count * activity.output_amount * count
+
+            if currency.name in self.stat_modifiers:
+                currency_modifier = self.stat_modifiers[currency.name]
+                amount_to_add *= currency_modifier['multiplier']
+
+            currency.add_amount(amount_to_add)
+
+        return activity_skill
+
+    def seconds_to_next_event(self, upgrade_costs: Optional[dict] = None):
+        # Seconds after last_update_time until the next change worth waking
+        # up for: energy running out or refilling, a currency reaching
+        # capacity or an upgrade's cost, or a skill levelling up. Rates are
+        # the ones update() uses in the current phase, so the answer is
+        # exact until that phase ends, and the phase ending is an event too.
+        # None when nothing is going to happen.
+        events = []
+        currency_rates = {currency.id: currency.currency_passive_gain for currency in self.currencies.values()}
+        exp_rates = {skill.id: skill.exp_passive_gain for skill in self.skills.values()}
+
+        activity = self.current_activity
+        if activity:
+            player_energy = self.energies.get(activity.energy_id)
+
+            if player_energy and player_energy.recovering:
+                if player_energy.recovery_rate > 0:
+                    events.append((player_energy.max_energy - player_energy.current_energy) / player_energy.recovery_rate)
+
+            elif player_energy:
+                # One activity per second while draining
+                events.append(player_energy.current_energy / activity.energy_drain_rate)
+
+                currency = self.currencies.get(activity.currency_id)
+                if currency:
+                    output = activity.output_amount
+                    if currency.name in self.stat_modifiers:
+                        output *= self.stat_modifiers[currency.name]['multiplier']
+                    currency_rates[currency.id] += output
+
+                if activity.skill_id in self.skills:
+                    exp_rates[activity.skill_id] += activity.skill_exp_rate
+
+                if player_energy.name.lower() == 'energy' and 0 in self.skills:
+                    exp_rates[0] += activity.energy_drain_rate
+
+        elif 0 in self.energies and self.energies[0].is_not_full() and self.energies[0].recovery_rate > 0:
+            base_energy = self.energies[0]
+            events.append((base_energy.max_energy - base_energy.current_energy) / base_energy.recovery_rate)
+
+        for currency in self.currencies.values():
+            rate = currency_rates[currency.id]
+            if rate > 0 and currency.amount < currency.capacity:
+                events.append((currency.capacity - currency.amount) / rate)
+
+        for skill in self.skills.values():
+            rate = exp_rates[skill.id]
+            if rate > 0 and skill.current_level < skill.max_level:
+                events.append(max(skill.exp_required_for_next_level() - skill.current_exp, 0) / rate)
+
+        # upgrade_costs maps a currency name to the sorted costs of the
+        # upgrades the player can see in the shop, see ShopState
+        for currency_name, costs in (upgrade_costs or {}).items():
+            currency = self.currencies_by_name.get(currency_name)
+            if not currency or currency_rates[currency.id] <= 0:
+                continue
+
+            index = bisect_right(costs, currency.amount)
+            if index < len(costs) and costs[index] <= currency.capacity:
+                events.append((costs[index] - currency.amount) / currency_rates[currency.id])
+
+        return min(events, default=None)
+
+    def energy_cycles(self, energy: Energy, activity: Activity, seconds):
+        # Whole drain and recover cycles that fit in the next seconds and all
+        # play out alike, as (cycles, seconds per cycle); (0, None) when the
+        # loop has to step. Without passive recovery that needs a full pool
+        # to start from. Passive recovery sets the pool to
+        # min(passive rate * seconds left, max) on every step, so while that
+        # is the max each drain starts full and recovery takes no time; the
+        # last of those cycles is left to the loop, which also sets the
+        # other energies' passive recovery for the time left.
+        if energy.max_energy <= 0 or activity.energy_drain_rate <= 0:
+            return 0, None
+
+        drain_time = energy.max_energy / activity.energy_drain_rate
+
+        if energy.energy_passive_recovery > 0:
+            last_cycle_start = max(energy.max_energy / energy.energy_passive_recovery, drain_time)
+            if seconds < last_cycle_start:
+                return 0, None
+            return math.floor((seconds - last_cycle_start) / drain_time), drain_time
+
+        if energy.recovering or energy.is_not_full() or energy.recovery_rate <= 0:
+            return 0, None
+
+        cycle_time = drain_time + energy.max_energy / energy.recovery_rate
+        return math.floor(seconds / cycle_time), cycle_time
+
     def update(self, current_time):
         if not self.energies:
             return
@@ -493,22 +805,46 @@ class Player:
 
         if self.current_activity:
             current_activity = self.current_activity
-            output_amount = current_activity.output_amount
 
-            player_currency = next((currency for currency in self.currencies.values() if currency.name == current_activity.output_item), None)
+            player_currency = self.currencies.get(current_activity.currency_id)
 
-            player_energy = next((energy for energy in self.energies.values() if current_activity.energy_type.lower() == energy.name.lower()), None)
+            player_energy = self.energies.get(current_activity.energy_id)
 
-            activity_skill = next((skill for skill in self.skills.values() if current_activity.skill and current_activity.skill.name.lower() == skill.name.lower()), current_activity.skill)
+            activity_skill = self.skills.get(current_activity.skill_id, current_activity.skill)
 
             if not player_energy:
                 return
 
+            # Rates stay fixed for the whole call (modifiers are only
+            # recalculated afterwards), so every full drain and recover cycle
+            # is identical. Whole cycles are applied in one step and the loop
+            # only walks the partial phases at either end, keeping the
+            # iteration count constant however long the player was away.
+            # Results agree with stepping cycle by cycle to within 1e-4 of a
+            # second of activity (about 1e-4 energy); that gap is rounding
+            # the stepping loop accumulates over thousands of cycles, the
+            # closed form is the closer of the two. Experience is granted per
+            # cycle as the loop does, see Skill.add_repeated_experience.
+            # benchmark.py checks both against each other.
             while activity_steps > 0:
                 if activity_steps < min_activity_step:
                     break
 
-                if player_energy.recovering:
+                cycles, cycle_time = self.energy_cycles(player_energy, current_activity, activity_steps)
+                if cycles:
+                    activity_steps -= cycles * cycle_time
+
+                    energy_used = player_energy.max_energy
+                    activity_count = energy_used / current_activity.energy_drain_rate
+
+                    self.gain_depletion_experience(player_energy, energy_used, cycles)
+                    activity_skill = self.gain_activity_progress(current_activity, activity_skill, player_currency, activity_count, cycles)
+
+                    # Every cycle ends with a full pool
+                    player_energy.current_energy = player_energy.max_energy
+                    player_energy.recovering = False
+
+                elif player_energy.recovering:
                     activity_steps -= self.recover_energy(player_energy, activity_steps)
                 else:
                     for energy in self.energies.values():
@@ -518,23 +854,9 @@ class Player:
                     activity_count = energy_to_use / current_activity.energy_drain_rate
                     activity_steps -= activity_count
 
-                    amount_to_add = activity_count * output_amount
-
                     self.deplete_energy(player_energy, energy_to_use)
 
-                    if activity_skill:
-                        if activity_skill.id not in self.skills:
-                            self.skills[activity_skill.id] = activity_skill.copy()
-                            activity_skill = self.skills[activity_skill.id]
-
-                        activity_skill.add_experience(current_activity.skill_exp_rate * activity_count)
-
-                    if player_currency:
-                        if player_currency.name in self.stat_modifiers:
-                            currency_modifier = self.stat_modifiers[player_currency.name]
-                            amount_to_add *= currency_modifier['multiplier']
-
-                        player_currency.add_amount(amount_to_add)
+                    activity_skill = self.gain_activity_progress(current_activity, activity_skill, player_currency, activity_count)
 
         # Recover energy if it's not idle and not full
         elif not self.current_activity and base_energy.is_not_full():
@@ -562,6 +884,50 @@ class Player:
         self.time_since_last_update = (current_time - self.last_update_time).total_seconds()
         self.last_update_time = current_time
 
+    def shop_render_key(self):
+        # Everything the shop embed shows of the player. Equal keys mean an
+        # embed rendered earlier is still accurate. modifier_signature covers
+        # upgrade counts and what the modifiers change; skill levels are
+        # there too since update() raises them before the modifiers are
+        # recalculated. A catalog reload clears the cached embeds.
+        return (
+            self.title,
+            self.display_name,
+            self.current_activity is not None,
+            self.modifier_signature,
+            tuple(skill.current_level for skill in self.skills.values()),
+            tuple((currency.amount, currency.capacity, currency.last_gained) for currency in self.currencies.values()),
+        )
+
+    def activities_render_key(self):
+        # Same for the activities embed, which shows no player numbers
+        return (
+            self.current_activity is not None,
+            self.modifier_signature,
+            tuple(skill.current_level for skill in self.skills.values()),
+            self.unlock_conditions,
+        )
+
+    def rows(self):
+        return {
+            'players': {self.id: (self.display_name, self.start_date, self.last_update_time)},
+            'player_upgrades': {id: upgrade.row() for id, upgrade in self.upgrades.items()},
+            'player_currencies': {id: currency.row() for id, currency in self.currencies.items()},
+            'player_skills': {id: skill.row() for id, skill in self.skills.items()},
+            'player_activities': {self.current_activity.id: ()} if self.current_activity else {},
+            'player_energies': {id: energy.row() for id, energy in self.energies.items()},
+        }
+
+    def changed_rows(self, rows):
+        changes = {}
+        for table, table_rows in rows.items():
+            saved = self.saved_rows.get(table, {})
+            changed = [(id, row) for id, row in table_rows.items() if saved.get(id) != row]
+            removed = [id for id in saved if id not in table_rows]
+            changes[table] = (changed, removed)
+
+        return changes
+
     def __str__(self):
 
         upgrades = 'Upgrades: ' + ' ,'.join([str(upgrade) for upgrade in self.upgrades.values()]) + '\n'
@@ -570,6 +936,300 @@ class Player:
             f'{upgrades if self.upgrades else ''}'
 
 
+class MenuState:
+    # What one of the paged menus lists for a player, in catalog order. Kept
+    # on the player until the catalog or the key object it was built from is
+    # replaced, so showing a page is a slice whatever the catalog size.
+    __slots__ = ('catalog', 'key', 'entries')
+
+    def __init__(self, catalog, key, entries: list):
+        self.catalog = catalog
+        self.key = key
+        self.entries = entries
+
+    def is_current(self, catalog, key):
+        return self.catalog is catalog and self.key is key
+
+    def page_count(self, per_page):
+        return max(1, math.ceil(len(self.entries) / per_page))
+
+    def page(self, page, per_page) -> list:
+        if page < 1:
+            return []
+        return self.entries[(page - 1) * per_page:page * per_page]
+
+
+class ShopState(MenuState):
+    # The shop also keeps the costs of its upgrades by currency, sorted, so
+    # finding the next one a player can afford is a bisect per currency
+    # rather than a walk over the catalog on every click.
+    __slots__ = ('costs',)
+
+    def __init__(self, catalog, key, entries: list):
+        super().__init__(catalog, key, entries)
+        costs: dict[str, list] = {}
+        for upgrade, _ in entries:
+            costs.setdefault(upgrade.cost_material.lower(), []).append(upgrade.cost)
+        self.costs = {currency_name: sorted(set(values)) for currency_name, values in costs.items()}
+
+
+class Catalog:
+    # Game definitions shared by every player. Nothing here is changed after
+    # loading, so it is handed out without copying; call copy() on an object
+    # only when a player takes ownership of it. Activities carry no player
+    # state and are used as they are.
+    def __init__(self, currencies=None, upgrades=None, skills=None, energies=None, activities=None):
+        self.currencies: MappingProxyType[int, Currency] = MappingProxyType(dict(currencies or {}))
+        self.upgrades: MappingProxyType[int, Upgrade] = MappingProxyType(dict(upgrades or {}))
+        self.skills: MappingProxyType[int, Skill] = MappingProxyType(dict(skills or {}))
+        self.energies: MappingProxyType[int, Energy] = MappingProxyType(dict(energies or {}))
+        self.activities: MappingProxyType[int, Activity] = MappingProxyType(dict(activities or {}))
+
+        self.currencies_by_name = index_by_name(self.currencies)
+        self.upgrades_by_name = index_by_name(self.upgrades)
+        self.skills_by_name = index_by_name(self.skills)
+        self.energies_by_name = index_by_name(self.energies)
+        self.activities_by_name = index_by_name(self.activities)
+
+        for activity in self.activities.values():
+            activity.bind(self)
+
+        # Unlock conditions parsed once, see parse_level_conditions. Activity
+        # conditions are unlocks that owned upgrades grant.
+        self.upgrade_level_conditions = {
+            id: parse_level_conditions(upgrade.unlock_conditions, self.skills_by_name) for id, upgrade in self.upgrades.items()
+        }
+        self.activity_unlock_conditions = {id: frozenset(activity.unlock_conditions) for id, activity in self.activities.items()}
+
+
+def index_by_name(objects):
+    return MappingProxyType({obj.name.lower(): obj for obj in objects.values()})
+
+
+def parse_level_conditions(conditions, skills_by_name) -> tuple[tuple[Optional[int], int], ...]:
+    # 'level.<skill>.<level>' conditions as (skill id, level). A skill that
+    # doesn't exist gets None, which no player has. Other kinds of condition
+    # are not checked.
+    level_conditions = []
+    for condition in conditions:
+        if not condition.startswith('level.'):
+            continue
+
+        parts = condition.split('.')
+        skill = skills_by_name.get(parts[1].lower()) if len(parts) == 3 else None
+        if skill and parts[2].isdigit():
+            level_conditions.append((skill.id, int(parts[2])))
+        else:
+            level_conditions.append((None, 0))
+
+    return tuple(level_conditions)
+
+
+class CatalogError(ValueError):
+    pass
+
+
+MODIFIER_TYPES = ('increase', 'multiplier')
+
+
+def read_game_data(folder, file_name):
+    path = os.path.join(folder, file_name)
+    try:
+        with open(path, encoding='utf-8') as file:
+            entries = json.load(file)
+    except (OSError, json.JSONDecodeError) as error:
+        raise CatalogError(f"{file_name}: {error}") from error
+
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        raise CatalogError(f"{file_name}: expected a list of entries")
+
+    return entries
+
+
+def catalog_field(entry, key, kind, where):
+    if key not in entry:
+        raise CatalogError(f"{where}: missing '{key}'")
+    try:
+        return kind(entry[key])
+    except (TypeError, ValueError) as error:
+        raise CatalogError(f"{where}: bad '{key}' {entry[key]!r}") from error
+
+
+def unique_ids(objects, file_name):
+    ids = [obj.id for obj in objects]
+    names = [obj.name.lower() for obj in objects]
+    if len(set(ids)) != len(ids):
+        raise CatalogError(f"{file_name}: duplicate ids")
+    if len(set(names)) != len(names):
+        raise CatalogError(f"{file_name}: duplicate names")
+
+    return {obj.id: obj for obj in objects}
+
+
+def load_effects(entry, where):
+    effects = entry.get('effects') or {}
+    if not isinstance(effects, dict):
+        raise CatalogError(f"{where}: 'effects' must be an object")
+
+    for stat, effect in effects.items():
+        if not isinstance(effect, dict) or stat.count('.') != 1:
+            raise CatalogError(f"{where}: effect '{stat}' is not 'target.attribute'")
+        if effect.get('modifier_type') not in MODIFIER_TYPES:
+            raise CatalogError(f"{where}: effect '{stat}' has unknown modifier_type {effect.get('modifier_type')!r}")
+        catalog_field(effect, 'modifier_value', float, f"{where}: effect '{stat}'")
+
+    return {
+        stat: {'modifier_type': effect['modifier_type'], 'modifier_value': float(effect['modifier_value'])}
+        for stat, effect in effects.items()
+    }
+
+
+def load_catalog_from_json(folder=game_data_folder) -> Catalog:
+    # Build the whole catalog from game_data, raising CatalogError on the
+    # first entry that is malformed or points at something that isn't there
+    currencies = []
+    for entry in read_game_data(folder, 'currencies.json'):
+        where = f"currencies.json {entry.get('id')!r}"
+        currencies.append(Currency(CurrencyDefinition(
+            catalog_field(entry, 'id', int, where),
+            catalog_field(entry, 'name', str, where),
+            catalog_field(entry, 'capacity', int, where))))
+    currencies = unique_ids(currencies, 'currencies.json')
+
+    energies = []
+    for entry in read_game_data(folder, 'energies.json'):
+        where = f"energies.json {entry.get('id')!r}"
+        energies.append(Energy(EnergyDefinition(
+            catalog_field(entry, 'id', int, where),
+            catalog_field(entry, 'name', str, where),
+            catalog_field(entry, 'max_energy', float, where),
+            catalog_field(entry, 'recovery_rate', float, where))))
+    energies = unique_ids(energies, 'energies.json')
+
+    skills = []
+    for entry in read_game_data(folder, 'skills.json'):
+        where = f"skills.json {entry.get('id')!r}"
+        skills.append(Skill(SkillDefinition(
+            id=catalog_field(entry, 'id', int, where),
+            name=catalog_field(entry, 'name', str, where),
+            description=catalog_field(entry, 'description', str, where),
+            start_level=catalog_field(entry, 'start_level', int, where),
+            max_level=catalog_field(entry, 'max_level', int, where),
+            base_exp_requirement=catalog_field(entry, 'base_exp_requirement', float, where),
+            scaling_factor=catalog_field(entry, 'scaling_factor', float, where),
+            exp_formula=catalog_field(entry, 'exp_formula', str, where),
+            effects=load_effects(entry, where)
+        )))
+    skills = unique_ids(skills, 'skills.json')
+    skills_by_name = index_by_name(skills)
+
+    upgrades = []
+    for entry in read_game_data(folder, 'upgrades.json'):
+        where = f"upgrades.json {entry.get('id')!r}"
+        upgrades.append(Upgrade(UpgradeDefinition(
+            id=catalog_field(entry, 'id', int, where),
+            name=catalog_field(entry, 'name', str, where),
+            cost_material=catalog_field(entry, 'cost_material', str, where),
+            cost=catalog_field(entry, 'cost', int, where),
+            max_purchases=catalog_field(entry, 'max_purchases', int, where),
+            description=catalog_field(entry, 'description', str, where),
+            unlock_conditions=[str(condition) for condition in entry.get('unlock_conditions') or []],
+            unlocks=[str(unlock) for unlock in entry.get('unlocks') or []],
+            effects=load_effects(entry, where)
+        )))
+    # The shop lists upgrades cheapest first
+    upgrades = unique_ids(sorted(upgrades, key=lambda upgrade: upgrade.cost), 'upgrades.json')
+
+    activities = []
+    for entry in read_game_data(folder, 'activities.json'):
+        where = f"activities.json {entry.get('id')!r}"
+        skill_name = catalog_field(entry, 'skill', str, where)
+        if skill_name and skill_name.lower() not in skills_by_name:
+            raise CatalogError(f"{where}: unknown skill '{skill_name}'")
+
+        activities.append(Activity(
+            id=catalog_field(entry, 'id', int, where),
+            name=catalog_field(entry, 'name', str, where),
+            icon=catalog_field(entry, 'icon', str, where),
+            output_item=catalog_field(entry, 'output_item', str, where),
+            output_amount=catalog_field(entry, 'output_amount', float, where),
+            energy_type=catalog_field(entry, 'energy_type', str, where),
+            energy_drain_rate=catalog_field(entry, 'energy_drain_rate', float, where),
+            skill=skills_by_name.get(skill_name.lower()),
+            skill_exp_rate=catalog_field(entry, 'skill_exp_rate', float, where),
+            unlock_conditions=tuple(str(condition) for condition in entry.get('unlock_conditions') or []),
+            description=catalog_field(entry, 'description', str, where),
+            status_description=catalog_field(entry, 'status_description', str, where)
+        ))
+    activities = unique_ids(activities, 'activities.json')
+
+    catalog = Catalog(currencies, upgrades, skills, energies, activities)
+    validate_catalog_references(catalog)
+
+    return catalog
+
+
+def catalog_file_stamps(folder=game_data_folder):
+    # Cheap change check for the watcher, the files are only read when this
+    # differs from the last load
+    stamps = []
+    for file_name in CATALOG_FILES:
+        try:
+            stat = os.stat(os.path.join(folder, file_name))
+        except OSError:
+            stamps.append((file_name, None, None))
+        else:
+            stamps.append((file_name, stat.st_mtime_ns, stat.st_size))
+
+    return tuple(stamps)
+
+
+def validate_catalog_references(catalog: Catalog):
+    # New players start with id 0 of each of these, and Player.update and
+    # the stats embed read energy 0 and skill 0 directly
+    for file_name, definitions in (('currencies.json', catalog.currencies), ('energies.json', catalog.energies),
+                                   ('skills.json', catalog.skills), ('upgrades.json', catalog.upgrades)):
+        if 0 not in definitions:
+            raise CatalogError(f"{file_name}: missing the starting entry with id 0")
+
+    for activity in catalog.activities.values():
+        where = f"activities.json {activity.id}"
+        if activity.output_item and activity.output_item.lower() not in catalog.currencies_by_name:
+            raise CatalogError(f"{where}: unknown output_item '{activity.output_item}'")
+        if activity.energy_type.lower() not in catalog.energies_by_name:
+            raise CatalogError(f"{where}: unknown energy_type '{activity.energy_type}'")
+        if activity.energy_drain_rate <= 0:
+            raise CatalogError(f"{where}: energy_drain_rate must be positive")
+
+    # Effects can only change per-player state, plus '<currency>.gain' for
+    # activity output and '<upgrade>.effects' for another upgrade's effects
+    attributes: dict[str, set[str]] = {}
+    for entries, extra_attributes in ((catalog.currencies, ('gain',)), (catalog.energies, ()),
+                                      (catalog.skills, ()), (catalog.upgrades, ('effects',))):
+        for entry in entries.values():
+            target_attributes = attributes.setdefault(entry.name.lower(), set())
+            target_attributes.update(slot for slot in type(entry).__slots__ if slot != 'definition')
+            target_attributes.update(extra_attributes)
+
+    for upgrade in catalog.upgrades.values():
+        where = f"upgrades.json {upgrade.id}"
+        if upgrade.cost_material.lower() not in catalog.currencies_by_name:
+            raise CatalogError(f"{where}: unknown cost_material '{upgrade.cost_material}'")
+        for condition in upgrade.unlock_conditions:
+            if condition.startswith('level.'):
+                parts = condition.split('.')
+                if len(parts) != 3 or parts[1].lower() not in catalog.skills_by_name or not parts[2].isdigit():
+                    raise CatalogError(f"{where}: bad unlock condition '{condition}'")
+
+    for file_name, owners in (('upgrades.json', catalog.upgrades), ('skills.json', catalog.skills)):
+        for owner in owners.values():
+            for stat, target, attribute, _, _ in owner.modifiers:
+                if target not in attributes:
+                    raise CatalogError(f"{file_name} {owner.id}: effect '{stat}' targets unknown '{target}'")
+                if attribute not in attributes[target]:
+                    raise CatalogError(f"{file_name} {owner.id}: effect '{stat}' changes '{attribute}', which players don't own a copy of")
+
+
 class WrongChannelError(commands.CheckFailure):
     pass
 
@@ -577,14 +1237,24 @@ class WrongChannelError(commands.CheckFailure):
 class IncrementalGameCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.players: dict[int, Player] = {}
-        self.upgrades: dict[int,  Upgrade] = {}
-        self.activities: dict[int, Activity] = {}
-        self.skills: dict[int, Skill] = {}
-        self.energies: dict[int, Energy] = {}
-        self.currencies: dict[int, Currency] = {}
-        self.views: dict[int, discord.ui.View] = {}
+        self.players: LRUCache = LRUCache(PLAYER_CACHE_SIZE, PLAYER_CACHE_TTL, self.on_player_evicted)
+        self.catalog = Catalog()
+        self.embeds: LRUCache = LRUCache(EMBED_CACHE_SIZE)
+        # Catalog-only text for the embeds, see render_fragments
+        self.fragments_catalog: Optional[Catalog] = None
+        self.upgrade_fragments: dict[int, tuple[str, str]] = {}
+        self.activity_fragments: dict[int, tuple[str, str, str, str]] = {}
+        self.embed_reuses = 0
+        self.embed_renders = 0
         self.allowed_channels = {}
+        self.game_db = Database(GAME_DB_LOCATION, readers=4)
+        self.server_db = Database(SERVER_DB_LOCATION, readers=1)
+        self.save_queue = WriteBehindQueue(self.players_to_database_update, SAVE_INTERVAL, SAVE_BATCH_SIZE)
+        self.scheduler = EventScheduler(self.on_player_event)
+        self.catalog_stamps = None
+        self.catalog_watcher: Optional[asyncio.Task] = None
+        self.batch_ticker: Optional[asyncio.Task] = None
+        self.metrics_runner = None
 
         self.initialized = False
 
@@ -593,20 +1263,153 @@ class IncrementalGameCog(commands.Cog):
     def initialize(self):
         self.initialized = True
 
-    def get_energies(self):
-        return {id: energy.copy() for id, energy in self.energies.items()}
+        if CATALOG_WATCH_INTERVAL > 0 and self.catalog_watcher is None:
+            self.catalog_watcher = asyncio.create_task(self.watch_catalog())
+
+        if BATCH_TICK_INTERVAL > 0 and self.batch_ticker is None:
+            self.batch_ticker = asyncio.create_task(self.tick_players())
+
+    def on_player_evicted(self, player_id, player):
+        self.scheduler.cancel(player_id)
+
+        # The save queue holds on to dirty players, so nothing is lost when
+        # they leave the cache. Ask for the flush now rather than later.
+        if self.save_queue.is_pending(player_id):
+            self.save_queue.wake.set()
+
+    async def open_databases(self):
+        await self.game_db.open()
+        await self.server_db.open()
+        self.save_queue.start()
+        self.scheduler.start()
+
+    async def cog_unload(self):
+        if self.catalog_watcher is not None:
+            self.catalog_watcher.cancel()
+            self.catalog_watcher = None
+
+        if self.batch_ticker is not None:
+            self.batch_ticker.cancel()
+            self.batch_ticker = None
+
+        await self.scheduler.stop()
+
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+            self.metrics_runner = None
+
+        # Bot.close() removes the cog too, so this also drains on shutdown
+        await self.update_all_players()
+        await self.save_queue.stop()
+        await self.game_db.close()
+        await self.server_db.close()
+
+    @property
+    def energies(self):
+        return self.catalog.energies
+
+    @property
+    def upgrades(self):
+        return self.catalog.upgrades
+
+    @property
+    def activities(self):
+        return self.catalog.activities
+
+    @property
+    def skills(self):
+        return self.catalog.skills
+
+    @property
+    def currencies(self):
+        return self.catalog.currencies
+
+    def load_catalog(self):
+        self.catalog_stamps = catalog_file_stamps(game_data_folder)
+        self.catalog = load_catalog_from_json(game_data_folder)
+
+    async def reload_catalog(self):
+        # Parse and validate off the event loop; a CatalogError leaves the
+        # current catalog in place. The swap and rebinding below don't await,
+        # so no command ever sees players half way between two catalogs.
+        stamps = catalog_file_stamps(game_data_folder)
+        catalog = await asyncio.to_thread(load_catalog_from_json, game_data_folder)
+
+        # Time played so far counts at the old rates
+        residents = {**self.save_queue.in_flight, **self.save_queue.pending, **self.players}
+        for player in residents.values():
+            self.advance_player(player)
+
+        self.catalog = catalog
+        self.catalog_stamps = stamps
+
+        for player in residents.values():
+            self.rebind_player(player)
+
+        return len(residents)
+
+    def rebind_player(self, player: Player):
+        # Swap the player's copies of catalog objects for copies of the new
+        # definitions, keeping what the player owns. Entries that are gone
+        # from game_data are dropped in memory and from saved_rows, so their
+        # rows stay in the database like they do on a fresh load.
+        def owned(table, owned_objects, definitions):
+            for id in list(owned_objects):
+                if id not in definitions:
+                    del owned_objects[id]
+                    player.saved_rows.get(table, {}).pop(id, None)
+                    continue
+                yield id, owned_objects[id], definitions[id]
+
+        for id, old_upgrade, upgrade in owned('player_upgrades', player.upgrades, self.upgrades):
+            new_upgrade = upgrade.copy()
+            new_upgrade.count = old_upgrade.count
+            player.upgrades[id] = new_upgrade
 
-    def get_upgrades(self):
-        return {id: upgrade.copy() for id, upgrade in self.upgrades.items()}
+        for id, old_currency, currency in owned('player_currencies', player.currencies, self.currencies):
+            new_currency = currency.copy()
+            new_currency.set_amount(old_currency.amount)
+            player.currencies[id] = new_currency
 
-    def get_activities(self):
-        return {id: activity.copy() for id, activity in self.activities.items()}
+        for id, old_skill, skill in owned('player_skills', player.skills, self.skills):
+            new_skill = skill.copy()
+            new_skill.add_experience(old_skill.current_exp)
+            player.skills[id] = new_skill
 
-    def get_skills(self):
-        return {id: skill.copy() for id, skill in self.skills.items()}
+        for id, old_energy, energy in owned('player_energies', player.energies, self.energies):
+            new_energy = energy.copy()
+            new_energy.current_energy = old_energy.current_energy
+            new_energy.recovering = old_energy.recovering
+            player.energies[id] = new_energy
 
-    def get_currencies(self):
-        return {id: currency.copy() for id, currency in self.currencies.items()}
+        player.index_names()
+
+        if player.current_activity:
+            activity = self.activities.get(player.current_activity.id)
+            if activity is None:
+                player.saved_rows.get('player_activities', {}).pop(player.current_activity.id, None)
+            player.current_activity = activity
+
+        player.update_unlock_conditions()
+        player.modifier_signature = None
+        self.recalculate_player_modifiers(player)
+        self.schedule_player(player, datetime.now())
+
+    async def watch_catalog(self):
+        while True:
+            await asyncio.sleep(CATALOG_WATCH_INTERVAL)
+
+            if catalog_file_stamps(game_data_folder) == self.catalog_stamps:
+                continue
+
+            try:
+                player_count = await self.reload_catalog()
+            except CatalogError as error:
+                # Don't retry the same broken files, wait for the next edit
+                self.catalog_stamps = catalog_file_stamps(game_data_folder)
+                print(f"Catalog reload failed, keeping the current one: {error}")
+            else:
+                print(f"Catalog reloaded, {player_count} resident players updated")
 
     async def is_allowed_channel(self, ctx):
         server_id = ctx.guild.id
@@ -650,6 +1453,53 @@ class IncrementalGameCog(commands.Cog):
 
         await self.save_channels_to_db()
 
+    @commands.command(name='reload_catalog')
+    @commands.is_owner()
+    async def reload_catalog_command(self, ctx):
+        if not self.initialized:
+            print("Not done initializing!")
+            return
+
+        try:
+            player_count = await self.reload_catalog()
+        except CatalogError as error:
+            await ctx.send(f"Catalog not reloaded: {error}")
+            return
+
+        await ctx.send(f"Catalog reloaded, {player_count} resident players updated.")
+
+    @commands.command(name='stats')
+    @commands.is_owner()
+    async def stats(self, ctx):
+        def ms(histogram, q=0.95):
+            return f"{histogram.quantile(q) * 1000:.2f}" if histogram else '-'
+
+        phases = ('load', 'simulate', 'modify', 'persist', 'render')
+        lines = ['p95 ms per interaction phase', f"{'callback':<26}{'count':>6}{'total':>8}" + ''.join(f'{phase[:8]:>9}' for phase in phases)]
+        for callback in metrics.label_values('interaction_seconds', 'callback'):
+            total = metrics.histogram('interaction_seconds', callback=callback)
+            lines.append(f"{callback:<26}{total.count:>6}{ms(total):>8}" + ''.join(
+                f"{ms(metrics.histogram('interaction_phase_seconds', callback=callback, phase=phase)):>9}" for phase in phases))
+
+        lines += ['', 'database queries', f"{'query':<26}{'count':>6}{'p50 ms':>8}{'p95 ms':>9}{'p99 ms':>9}"]
+        for query in metrics.label_values('db_query_seconds', 'query'):
+            histogram = metrics.histogram('db_query_seconds', query=query)
+            lines.append(f"{query:<26}{histogram.count:>6}{ms(histogram, 0.5):>8}{ms(histogram):>9}{ms(histogram, 0.99):>9}")
+
+        player_cache = self.players.stats()
+        lines += ['', f"players cached {player_cache['size']}/{player_cache['max_size']}, "
+                      f"hits {player_cache['hits']}, misses {player_cache['misses']}, "
+                      f"saves pending {len(self.save_queue.pending)}",
+                  f"embeds reused {self.embed_reuses}, rendered {self.embed_renders}",
+                  f"game db waits: read {self.game_db.read_wait_seconds * 1000:.0f}ms over {self.game_db.read_waits}, "
+                  f"write {self.game_db.write_wait_seconds * 1000:.0f}ms over {self.game_db.write_waits}"]
+
+        text = '\n'.join(lines)
+        if len(text) > MAX_MESSAGE_LENGTH - 8:
+            text = text[:MAX_MESSAGE_LENGTH - 12] + '\n...'
+
+        await ctx.send(f"```\n{text}```")
+
     @commands.command(name='levelup')
     async def levelup(self, ctx, *args):
         if not self.initialized:
@@ -664,11 +1514,12 @@ class IncrementalGameCog(commands.Cog):
         user_id = ctx.author.id
         player = await self.get_player(user_id)
 
-        skill = next((skill for skill in self.get_skills().values() if skill.name.lower() == skill_name.lower()), None)
+        skill = self.catalog.skills_by_name.get(skill_name.lower())
 
         if player and skill:
             if skill.id not in player.skills:
-                player.skills[skill.id] = skill
+                skill = skill.copy()
+                player.add_skill(skill)
             else:
                 skill = player.skills[skill.id]
 
@@ -689,11 +1540,12 @@ class IncrementalGameCog(commands.Cog):
         user_id = ctx.author.id
         player = await self.get_player(user_id)
 
-        skill = next((skill for skill in self.get_skills().values() if skill.name.lower() == skill_name.lower()), None)
+        skill = self.catalog.skills_by_name.get(skill_name.lower())
 
         if player and skill:
             if skill.id not in player.skills:
-                player.skills[skill.id] = skill
+                skill = skill.copy()
+                player.add_skill(skill)
             else:
                 skill = player.skills[skill.id]
 
@@ -702,6 +1554,7 @@ class IncrementalGameCog(commands.Cog):
 
     # Command to send a message with the button
     @commands.hybrid_command(name='play', with_app_command=True)
+    @metrics.instrument
     async def play(self, ctx):
         """Interactive play command"""
         if not self.initialized:
@@ -710,98 +1563,134 @@ class IncrementalGameCog(commands.Cog):
 
         user_id = ctx.author.id
         player = await self.get_player(user_id)
-        view = MainMenuView(self, user_id)
 
         if not player:
-            view.create_register_menu()
-            register_message = "You have not registered yet!" \
-                "\nGame offers content up to **level 10** of skills."\
-                "\n**WARNING** Game is still in development so your progress"\
-                " will be reset until full version release!"
-            message = await ctx.send(content=register_message, view=view)
-            self.views[message.id] = view
+            with metrics.phase('render'):
+                view = MainMenuView(self, user_id)
+                view.create_register_menu()
+                register_message = "You have not registered yet!" \
+                    "\nGame offers content up to **level 10** of skills."\
+                    "\n**WARNING** Game is still in development so your progress"\
+                    " will be reset until full version release!"
+                await ctx.send(content=register_message, view=view)
         else:
             await self.update_player(player)
-            message = await ctx.send(content='', embed=self.player_stats_embed_message(player), view=view)
-            self.views[message.id] = view
+            with metrics.phase('render'):
+                view = MainMenuView(self, user_id)
+                await ctx.send(content='', embed=self.player_stats_embed_message(player), view=view)
+
+    async def dispatch_button(self, interaction: discord.Interaction, action, page, target_id):
+        # Every GameButton click lands here, after it checked the owner
+        if not self.initialized:
+            print("Not done initializing!")
+            return
 
+        if action == 'main':
+            await self.main_menu_callback(interaction)
+        elif action == 'shop':
+            await self.shop_menu_callback(interaction, page)
+        elif action == 'activities':
+            await self.activities_menu_callback(interaction, page)
+        elif action == 'buy':
+            await self.buy_upgrade_callback(interaction, target_id, page)
+        elif action == 'start':
+            await self.start_activity_callback(interaction, target_id, page)
+        elif action == 'register':
+            await self.register_callback(interaction)
+
+    @metrics.instrument
     async def shop_menu_callback(self, interaction: discord.Interaction, page=1):
         user = interaction.user
-        if not await self._is_valid_interaction(interaction):
-            return
 
         player = await self.get_player(user.id)
         if player:
             await self.update_player(player)
             if page < 1:
                 page = 1
-            view = ShopMenuView(self, user.id, player, UPGRADES_PER_PAGE, page)
-            await interaction.response.edit_message(content='', embed=self.player_shop_embed_message(player, page), view=view)
+            with metrics.phase('render'):
+                view = ShopMenuView(self, user.id, player, UPGRADES_PER_PAGE, page)
+                await interaction.response.edit_message(content='', embed=self.player_shop_embed_message(player, page), view=view)
 
     async def update_callback(self, interaction: discord.Interaction):
         user = interaction.user
-        if not await self._is_valid_interaction(interaction):
-            return
 
         player = await self.get_player(user.id)
         if player:
             await self.update_player(player)
 
+    @metrics.instrument
     async def main_menu_callback(self, interaction: discord.Interaction):
         user = interaction.user
-        if not await self._is_valid_interaction(interaction):
-            return
 
         player = await self.get_player(user.id)
         if player:
             await self.update_player(player)
-            view = MainMenuView(self, user.id)
-            await interaction.response.edit_message(content='', embed=self.player_stats_embed_message(player), view=view)
+            with metrics.phase('render'):
+                view = MainMenuView(self, user.id)
+                await interaction.response.edit_message(content='', embed=self.player_stats_embed_message(player), view=view)
 
+    @metrics.instrument
     async def activities_menu_callback(self, interaction: discord.Interaction, page=1):
         user = interaction.user
-        if not await self._is_valid_interaction(interaction):
-            return
 
         player = await self.get_player(user.id)
         if player:
             await self.update_player(player)
             if page < 1:
                 page = 1
-            view = ActivitiesMenuView(self, user.id, player, ACTIVITIES_PER_PAGE, page)
-            await interaction.response.edit_message(content='', embed=self.player_activities_embed_message(player, page), view=view)
+            with metrics.phase('render'):
+                view = ActivitiesMenuView(self, user.id, player, ACTIVITIES_PER_PAGE, page)
+                await interaction.response.edit_message(content='', embed=self.player_activities_embed_message(player, page), view=view)
 
-    async def buy_upgrade_callback(self, interaction: discord.Interaction, upgrade: Upgrade, page=1):
+    @metrics.instrument
+    async def buy_upgrade_callback(self, interaction: discord.Interaction, upgrade_id: int, page=1):
         user = interaction.user
-        if not await self._is_valid_interaction(interaction):
-            return
 
         player = await self.get_player(user.id)
 
+        # The menu may predate a catalog reload or a restart
+        upgrade = self.upgrades.get(upgrade_id)
+        if upgrade is None:
+            await interaction.response.send_message("That upgrade is no longer available, use /play to open a new menu.", ephemeral=True)
+            return
+
         if player:
-            player.buy_upgrade(upgrade)
-            self.recalculate_player_modifiers(player)
+            with metrics.phase('modify'):
+                player.buy_upgrade(upgrade)
+                self.recalculate_player_modifiers(player)
             await self.update_player(player)
-            view = ShopMenuView(self, user.id, player, UPGRADES_PER_PAGE, page)
-            await interaction.response.edit_message(content='', embed=self.player_shop_embed_message(player, page), view=view)
-
-    async def start_activity_callback(self, interaction: discord.Interaction, activity: Activity, page=1):
+            with metrics.phase('render'):
+                # Stay on this page, unless buying out its last upgrade
+                # removed it
+                page = min(page, self.get_shop_state(player).page_count(UPGRADES_PER_PAGE))
+                view = ShopMenuView(self, user.id, player, UPGRADES_PER_PAGE, page)
+                await interaction.response.edit_message(content='', embed=self.player_shop_embed_message(player, page), view=view)
+
+    @metrics.instrument
+    async def start_activity_callback(self, interaction: discord.Interaction, activity_id: Optional[int], page=1):
         user = interaction.user
-        if not await self._is_valid_interaction(interaction):
-            return
 
         player = await self.get_player(user.id)
 
+        # The menu may predate a catalog reload or a restart. No activity
+        # means stop.
+        activity = None
+        if activity_id is not None:
+            activity = self.activities.get(activity_id)
+            if activity is None:
+                await interaction.response.send_message("That activity is no longer available, use /play to open a new menu.", ephemeral=True)
+                return
+
         if player:
-            player.change_activity(activity)
+            with metrics.phase('modify'):
+                player.change_activity(activity)
             await self.update_player(player)
-            view = ActivitiesMenuView(self, user.id, player, ACTIVITIES_PER_PAGE, page)
-            await interaction.response.edit_message(content='', embed=self.player_activities_embed_message(player, page), view=view)
+            with metrics.phase('render'):
+                view = ActivitiesMenuView(self, user.id, player, ACTIVITIES_PER_PAGE, page)
+                await interaction.response.edit_message(content='', embed=self.player_activities_embed_message(player, page), view=view)
 
     async def register_callback(self, interaction: discord.Interaction):
         user = interaction.user
-        if not await self._is_valid_interaction(interaction):
-            return
 
         player = await self.get_player(int(user.id))
 
@@ -813,15 +1702,8 @@ class IncrementalGameCog(commands.Cog):
             view = MainMenuView(self, user.id)
             await interaction.response.edit_message(content='', embed=self.player_stats_embed_message(player), view=view)
 
-    async def _is_valid_interaction(self, interaction: discord.Interaction):
-        view = self.views.get(interaction.message.id)
-
-        if view and not view.is_owner(interaction):
-            return False
-        return True
-
     async def get_server_channels_from_db(self):
-        async with aiosqlite.connect(SERVER_DB_LOCATION) as db:
+        async with self.server_db.read() as db:
             async with db.execute('''
             SELECT server_id, server_name
             FROM servers''') as cursor:
@@ -845,460 +1727,240 @@ class IncrementalGameCog(commands.Cog):
                             "name": channel_name
                         })
 
-    async def get_energies_from_db(self):
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            async with db.execute('''
-            SELECT energy_id, name, max_energy, recovery_rate
-            FROM energies''') as cursor:
-
-                energies = await cursor.fetchall()
-
-                self.energies = {}
-                for energy in energies:
-                    self.energies[energy[0]] = Energy(
-                        energy[0], energy[1],
-                        energy[2], energy[3])
-
-    async def get_currencies_from_db(self):
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            async with db.execute('''
-            SELECT currency_id, name, default_capacity
-            FROM currencies''') as cursor:
-
-                currencies = await cursor.fetchall()
-
-                self.currencies = {}
-                for currency in currencies:
-                    self.currencies[currency[0]] = Currency(
-                        currency[0], currency[1],
-                        currency[2])
-
-    async def get_skills_from_db(self):
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            async with db.execute('''
-            SELECT skill_id, name, description, start_level, max_level, base_exp_requirement, scaling_factor, exp_formula
-            FROM skills''') as cursor:
-
-                skills = await cursor.fetchall()
-
-                self.skills = {}
-                for skill in skills:
-                    self.skills[skill[0]] = Skill(
-                            id=skill[0],
-                            name=skill[1],
-                            description=skill[2],
-                            start_level=skill[3],
-                            max_level=skill[4],
-                            base_exp_requirement=skill[5],
-                            scaling_factor=skill[6],
-                            exp_formula=skill[7]
-                        )
-
-            # Fetch the effects from the skill_effects table
-            async with db.execute('''
-            SELECT skill_id, stat, modifier_type, modifier_value
-            FROM skill_effects''') as cursor:
-
-                effects = await cursor.fetchall()
-
-                for effect in effects:
-                    skill_id = effect[0]
-                    stat = effect[1]
-                    modifier_type = effect[2]
-                    modifier_value = effect[3]
-
-                    if skill_id in self.skills:
-                        self.skills[skill_id].effects[stat] = {
-                            'modifier_type': modifier_type,
-                            'modifier_value': modifier_value
-                        }
-
-    async def get_activities_from_db(self):
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            async with db.execute('''
-            SELECT activity_id, name, icon, output_item, output_amount, energy_type, energy_drain_rate, skill, skill_exp_rate, unlock_conditions, description, status_description
-            FROM activities''') as cursor:
-
-                activities = await cursor.fetchall()
-
-                self.activities = {}
-                for activity in activities:
-                    skill = next((skill.copy() for skill in self.get_skills().values() if activity[7].lower() == skill.name.lower()), None)
-                    unlock_conditions = activity[9]
-                    if unlock_conditions is None or unlock_conditions == "":
-                        unlock_conditions = []
-                    else:
-                        unlock_conditions = unlock_conditions.split(',')
-
-                    self.activities[activity[0]] = Activity(
-                            id=activity[0],
-                            name=activity[1],
-                            icon=activity[2],
-                            output_item=activity[3],
-                            output_amount=activity[4],
-                            energy_type=activity[5],
-                            energy_drain_rate=activity[6],
-                            skill=skill,
-                            skill_exp_rate=activity[8],
-                            unlock_conditions=unlock_conditions,
-                            description=activity[10],
-                            status_description=activity[11]
-                        )
-
-    async def get_upgrades_from_db(self):
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            async with db.execute('''
-            SELECT upgrade_id, name, cost_material, cost, max_purchases, description
-            FROM upgrades''') as cursor:
-
-                upgrades = await cursor.fetchall()
-
-                self.upgrades = {}
-                unordered_upgrades = {}
-                for upgrade in sorted(upgrades, key=lambda x: x[3]):
-                    unordered_upgrades[upgrade[0]] = Upgrade(
-                        id=upgrade[0],
-                        name=upgrade[1],
-                        cost_material=upgrade[2],
-                        cost=upgrade[3],
-                        max_purchases=upgrade[4],
-                        description=upgrade[5]
-                    )
-
-                self.upgrades = deepcopy(unordered_upgrades)
-
-            # Fetch the effects from the upgrade_effects table
-            async with db.execute('''
-            SELECT upgrade_id, stat, modifier_type, modifier_value
-            FROM upgrade_effects''') as cursor:
-
-                effects = await cursor.fetchall()
-
-                for effect in effects:
-                    upgrade_id = effect[0]
-                    stat = effect[1]
-                    modifier_type = effect[2]
-                    modifier_value = effect[3]
-
-                    if upgrade_id in self.upgrades:
-                        self.upgrades[upgrade_id].effects[stat] = {
-                            'modifier_type': modifier_type,
-                            'modifier_value': modifier_value
-                        }
-
-            async with db.execute('''
-            SELECT upgrade_id, condition
-            FROM upgrade_unlock_conditions''') as cursor:
-
-                unlock_conditions = await cursor.fetchall()
-
-                for condition in unlock_conditions:
-                    upgrade_id = condition[0]
-                    condition_text = condition[1]
-
-                    if upgrade_id in self.upgrades:
-                        self.upgrades[upgrade_id].unlock_conditions.append(condition_text)
-
-            async with db.execute('''
-            SELECT upgrade_id, condition
-            FROM upgrade_unlocks''') as cursor:
-
-                unlocks = await cursor.fetchall()
-
-                for unlock in unlocks:
-                    upgrade_id = unlock[0]
-                    condition_text = unlock[1]
-
-                    if upgrade_id in self.upgrades:
-                        self.upgrades[upgrade_id].unlocks.append(condition_text)
-
-    async def get_player_activities_from_db(self, player_id):
-        await self.get_activities_from_db()
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            async with db.execute('''
-            SELECT player_id, activity_id
-            FROM player_activities
-            WHERE player_id = ?''', (player_id,)) as cursor:
-
-                player_activities = await cursor.fetchall()
-
-                for player_activity in player_activities:
-                    player_id, activity_id = player_activity
-                    player = self.players[int(player_id)]
-                    player.current_activity = self.activities[activity_id].copy()
-
-    async def get_player_energies_from_db(self, player_id):
-        await self.get_energies_from_db()
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            async with db.execute('''
-            SELECT player_id, energy_id, current_energy
-            FROM player_energies
-            WHERE player_id = ?''', (player_id,)) as cursor:
-
-                player_energies = await cursor.fetchall()
-
-                for player_energy in player_energies:
-                    player_id, energy_id, current_amount = player_energy
-                    player = self.players[int(player_id)]
-                    energy = self.energies[energy_id].copy()
-                    player.add_energy(energy)
-                    energy.current_energy = current_amount
-
-    async def get_player_currencies_from_db(self, player_id):
-        await self.get_currencies_from_db()
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            async with db.execute('''
-            SELECT player_id, currency_id, amount
-            FROM player_currencies
-            WHERE player_id = ?''', (player_id,)) as cursor:
-
-                player_currencies = await cursor.fetchall()
-
-                for player_currency in player_currencies:
-                    player_id, currency_id, amount = player_currency
-                    player = self.players[int(player_id)]
-                    currency = self.currencies[currency_id].copy()
-                    player.add_currency(currency)
-                    currency.set_amount(amount)
-
-    async def get_player_skills_from_db(self, player_id):
-        await self.get_skills_from_db()
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            async with db.execute('''
-            SELECT player_id, skill_id, current_level, current_exp
-            FROM player_skills
-            WHERE player_id = ?''', (player_id,)) as cursor:
-
-                player_skills = await cursor.fetchall()
-
-                for player_skill in player_skills:
-                    player_id, skill_id, _, current_exp = player_skill
-                    player = self.players[int(player_id)]
-                    skill = self.skills[skill_id].copy()
-                    player.add_skill(skill)
-                    skill.add_experience(current_exp)
-
-    async def get_player_upgrades_from_db(self, player_id):
-        await self.get_upgrades_from_db()
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            async with db.execute('''
-            SELECT player_id, upgrade_id, count
-            FROM player_upgrades
-            WHERE player_id = ?''', (player_id,)) as cursor:
+    async def get_player_from_db(self, player_id):
+        # Every row that makes up a player in a single round trip. The first
+        # column says which table the row came from.
+        async with self.game_db.read() as db:
+            with metrics.timer('db_query_seconds', query='load_player'):
+                async with db.execute('''
+                SELECT 'player', NULL, player_display_name, start_date, last_update_time
+                FROM players WHERE player_id = :player_id
+                UNION ALL
+                SELECT 'upgrade', upgrade_id, count, NULL, NULL
+                FROM player_upgrades WHERE player_id = :player_id
+                UNION ALL
+                SELECT 'currency', currency_id, amount, NULL, NULL
+                FROM player_currencies WHERE player_id = :player_id
+                UNION ALL
+                SELECT 'skill', skill_id, current_level, current_exp, NULL
+                FROM player_skills WHERE player_id = :player_id
+                UNION ALL
+                SELECT 'activity', activity_id, NULL, NULL, NULL
+                FROM player_activities WHERE player_id = :player_id
+                UNION ALL
+                SELECT 'energy', energy_id, current_energy, NULL, NULL
+                FROM player_energies WHERE player_id = :player_id''', {'player_id': player_id}) as cursor:
+
+                    rows = await cursor.fetchall()
+
+        # Rows for entries that were removed from game_data are skipped and
+        # left out of saved_rows, so they stay in the database untouched
+        catalog_entries = {'upgrade': self.upgrades, 'currency': self.currencies, 'skill': self.skills,
+                           'activity': self.activities, 'energy': self.energies}
+        player_rows = {'player': [], 'upgrade': [], 'currency': [], 'skill': [], 'activity': [], 'energy': []}
+        for row in rows:
+            if row[0] in catalog_entries and row[1] not in catalog_entries[row[0]]:
+                continue
+            player_rows[row[0]].append(row[1:])
+
+        if not player_rows['player']:
+            return None
+
+        _, display_name, start_date, last_update_time = player_rows['player'][0]
+        player = Player(player_id, display_name)
+        player.last_update_time = datetime.fromisoformat(last_update_time)
+        player.start_date = datetime.fromisoformat(start_date)
+        player.saved_rows = {
+            'players': {player_id: (display_name, start_date, last_update_time)},
+            'player_upgrades': {id: (count,) for id, count, _, _ in player_rows['upgrade']},
+            'player_currencies': {id: (amount,) for id, amount, _, _ in player_rows['currency']},
+            'player_skills': {id: (level, exp) for id, level, exp, _ in player_rows['skill']},
+            'player_activities': {id: () for id, _, _, _ in player_rows['activity']},
+            'player_energies': {id: (current_energy,) for id, current_energy, _, _ in player_rows['energy']},
+        }
+
+        for upgrade_id, count, _, _ in player_rows['upgrade']:
+            player.add_upgrade(self.upgrades[upgrade_id], count)
+
+        for currency_id, amount, _, _ in player_rows['currency']:
+            currency = self.currencies[currency_id].copy()
+            player.add_currency(currency)
+            currency.set_amount(amount)
+
+        for skill_id, _, current_exp, _ in player_rows['skill']:
+            skill = self.skills[skill_id].copy()
+            player.add_skill(skill)
+            skill.add_experience(current_exp)
+
+        for activity_id, _, _, _ in player_rows['activity']:
+            player.current_activity = self.activities[activity_id]
+
+        for energy_id, current_energy, _, _ in player_rows['energy']:
+            energy = self.energies[energy_id].copy()
+            player.add_energy(energy)
+            energy.current_energy = current_energy
+
+        # Bring the player up to date in memory only. The stored rows plus
+        # last_update_time already describe this state, so there is nothing
+        # to write until the player actually changes something.
+        self.recalculate_player_modifiers(player)
+        self.advance_player(player)
 
-                player_upgrades = await cursor.fetchall()
+        return player
 
-                for player_upgrade in player_upgrades:
-                    player_id, upgrade_id, count = player_upgrade
-                    player = self.players[int(player_id)]
-                    upgrade = self.upgrades[upgrade_id].copy()
-                    player.add_upgrade(upgrade, count)
+    async def get_player(self, player_id: int):
+        with metrics.phase('load'):
+            player = self.players.get(int(player_id))
+            if player:
+                return player
 
-    async def get_player_from_db(self, player_id):
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            async with db.execute('''
-            SELECT player_id, player_display_name, start_date, last_update_time
-            FROM players
-            WHERE player_id = ?''', (player_id,)) as cursor:
-
-                found_player = await cursor.fetchone()
-
-                if found_player:
-                    player_id, display_name, start_date, last_update_time = found_player
-                    player = Player(player_id, display_name)
-                    player.last_update_time = datetime.fromisoformat(last_update_time)
-                    player.start_date = datetime.fromisoformat(start_date)
-                    self.players[int(player_id)] = player
-                    await self.get_player_upgrades_from_db(player_id)
-                    await self.get_player_currencies_from_db(player_id)
-                    await self.get_player_skills_from_db(player_id)
-                    await self.get_player_activities_from_db(player_id)
-                    await self.get_player_energies_from_db(player_id)
-                    self.recalculate_player_modifiers(player)
-
-                    await self.update_player(player)
-                    return player
-                else:
-                    return None
+            # Evicted but not saved yet, or still being written: the queued
+            # object is newer than what a database read would return
+            player = self.save_queue.get(int(player_id))
+            if not player:
+                player = await self.get_player_from_db(player_id)
 
-    async def get_player(self, player_id: int):
-        if player_id not in self.players:
-            player = await self.get_player_from_db(player_id)
             if player:
                 self.players[int(player_id)] = player
                 return player
             else:
                 return None
-        else:
-            await self.player_to_database_update(player_id)
-            return self.players[int(player_id)]
 
     def recalculate_player_modifiers(self, player: Player):
+        # Nothing to redo until an upgrade count or skill level changes
+        if not player.recalculate_modifiers():
+            return
 
-        # reset currency capacity
+        # reset currency capacity and passive gain
         for currency_id, player_currency in player.currencies.items():
-            baseline_currency = next((currency for currency in self.get_currencies().values() if currency_id == currency.id), None)
+            baseline_currency = self.currencies.get(currency_id)
 
             if baseline_currency:
                 player_currency.capacity = baseline_currency.capacity
+            player_currency.currency_passive_gain = 0
+
+        # reset energy recovery
+        for player_energy in player.energies.values():
+            player_energy.recovery_rate = player_energy.base_recovery_rate
+            player_energy.energy_passive_recovery = 0
 
         # reset upgrade max_purchases
         for upgrade_id, player_upgrade in player.upgrades.items():
-            baseline_upgrade = next((upgrade for upgrade in self.get_upgrades().values() if upgrade_id == upgrade.id), None)
+            baseline_upgrade = self.upgrades.get(upgrade_id)
 
             if baseline_upgrade:
                 player_upgrade.max_purchases = baseline_upgrade.max_purchases
-                player_upgrade.effects = deepcopy(baseline_upgrade.effects)
 
-        player.recalculate_modifiers()
         player.apply_upgrade_modifiers()
         player.apply_currency_modifiers()
         player.apply_energy_modifiers()
 
+    def advance_player(self, player: Player, current_time: Optional[datetime] = None):
+        with metrics.phase('simulate'):
+            current_time = current_time or datetime.now()
+            player.update(current_time)
+
+            self.recalculate_player_modifiers(player)
+            self.schedule_player(player, current_time)
+
+    def schedule_player(self, player: Player, current_time: datetime):
+        seconds = player.seconds_to_next_event(self.get_shop_state(player).costs)
+        if seconds is None:
+            self.scheduler.cancel(player.id)
+            return
+
+        # update() leaves last_update_time alone for steps under a second
+        seconds -= (current_time - player.last_update_time).total_seconds()
+        self.scheduler.schedule(player.id, max(seconds, MIN_EVENT_DELAY))
+
+    async def on_player_event(self, player_id):
+        # Idle players past the TTL are only dropped when something else is
+        # cached, drop them now so they aren't advanced and rescheduled
+        # forever. Plain indexing, an event shouldn't keep a player cached.
+        self.players.evict()
+        if player_id not in self.players:
+            return
+
+        await self.update_player(self.players[player_id])
+
     async def update_player(self, player):
+        self.advance_player(player)
+
+        with metrics.phase('persist'):
+            self.save_queue.mark_dirty(player.id, player)
+
+    async def update_all_players(self):
+        # Advance every cached player to the same moment and save them all in
+        # one transaction. Runs every BATCH_TICK_INTERVAL and on shutdown, so
+        # the database holds everyone's progress up to that moment.
+        self.players.evict()
+
         current_time = datetime.now()
-        player.update(current_time)
+        for player in self.players.values():
+            self.advance_player(player, current_time)
+            self.save_queue.mark_dirty(player.id, player)
 
-        self.recalculate_player_modifiers(player)
+        await self.save_queue.flush()
 
-        await self.player_to_database_update(player.id)
+    async def tick_players(self):
+        while True:
+            await asyncio.sleep(BATCH_TICK_INTERVAL)
 
-    async def player_to_database_update(self, player_id):
-        async with aiosqlite.connect(GAME_DB_LOCATION) as db:
-            player = self.players[int(player_id)]
-            player_upgrades = [(id, upgrade.count) for id, upgrade in player.upgrades.items()]
-            player_currencies = [(id, currency.amount) for id, currency in player.currencies.items()]
-            player_activity = player.current_activity
-            player_skills = [(id, skill.current_level, skill.current_exp) for id, skill in player.skills.items()]
-            player_energies = [(id, energy.current_energy) for id, energy in player.energies.items()]
+            try:
+                await self.update_all_players()
+            except Exception as error:
+                # The save queue keeps the batch, try again next tick
+                print(f"Batch tick failed: {error!r}")
 
-            await db.execute('BEGIN')
+    async def players_to_database_update(self, players: list[Player]):
+        if not players:
+            return
 
-            await self.update_player_upgrades(db, player_id, player_upgrades)
-            await self.update_player_currencies(db, player_id, player_currencies)
-            await self.update_player_skills(db, player_id, player_skills)
-            await self.update_player_activities(db, player_id, player_activity)
-            await self.update_player_energies(db, player_id, player_energies)
-            await self.update_player_data(db, player_id, player)
+        # Only rows that differ from what was last saved are written, one
+        # executemany per table for the whole batch of players.
+        upserts = {table: [] for table in PLAYER_ROW_UPSERTS}
+        deletes = {table: [] for table in PLAYER_ROW_DELETES}
+        saved_rows = []
 
-            await db.commit()
+        for player in players:
+            rows = player.rows()
 
-    async def update_player_upgrades(self, db, player_id, player_upgrades):
-        placeholders_upgrades = ', '.join('?' for _ in player_upgrades)
+            for table, (changed, removed) in player.changed_rows(rows).items():
+                if table == 'players':
+                    upserts[table].extend((id, *row) for id, row in changed)
+                else:
+                    upserts[table].extend((player.id, id, *row) for id, row in changed)
+                    deletes[table].extend((player.id, id) for id in removed)
 
-        # Clear all upgrades that player doesn't have anymore
-        if player_upgrades:
-            query = f"DELETE FROM player_upgrades WHERE player_id = ? AND upgrade_id NOT IN ({placeholders_upgrades})"
-            params_upgrades = [player_id] + [upgrade[0] for upgrade in player_upgrades]
-            await db.execute(query, params_upgrades)
-        else:
-            await db.execute("DELETE FROM player_upgrades WHERE player_id = ?", (player_id,))
-
-        # Add or update changed upgrades
-        for player_upgrade in player_upgrades:
-            await db.execute('''
-                INSERT OR REPLACE INTO player_upgrades (player_id, upgrade_id, count)
-                VALUES (?, ?, ?)
-            ''', (player_id, player_upgrade[0], player_upgrade[1]))
-
-    async def update_player_currencies(self, db, player_id, player_currencies):
-        placeholders_currencies = ', '.join('?' for _ in player_currencies)
-
-        # Clear all currencies that player doesn't have anymore
-        if player_currencies:
-            query = f"DELETE FROM player_currencies WHERE player_id = ? AND currency_id NOT IN ({placeholders_currencies})"
-            params_currencies = [player_id] + [currency[0] for currency in player_currencies]
-            await db.execute(query, params_currencies)
-        else:
-            await db.execute("DELETE FROM player_currencies WHERE player_id = ?", (player_id,))
-
-        # Add or update changed currencies
-        for player_currency in player_currencies:
-            await db.execute('''
-                INSERT OR REPLACE INTO player_currencies (player_id, currency_id, amount)
-                VALUES (?, ?, ?)
-            ''', (player_id, player_currency[0], player_currency[1]))
-
-    async def update_player_energies(self, db, player_id, player_energies):
-        placeholders_energies = ', '.join('?' for _ in player_energies)
-
-        # Clear all energies that the player doesn't have anymore
-        if player_energies:
-            query = f"DELETE FROM player_energies WHERE player_id = ? AND energy_id NOT IN ({placeholders_energies})"
-            params_energies = [player_id] + [energy[0] for energy in player_energies]
-            await db.execute(query, params_energies)
-        else:
-            await db.execute("DELETE FROM player_energies WHERE player_id = ?", (player_id,))
-
-        # Add or update the player's energies
-        for energy_id, current_energy in player_energies:
-            await db.execute('''
-                INSERT OR REPLACE INTO player_energies (player_id, energy_id, current_energy)
-                VALUES (?, ?, ?)
-            ''', (player_id, energy_id, current_energy))
-
-    async def update_player_skills(self, db, player_id, player_skills):
-        placeholders_skills = ', '.join('?' for _ in player_skills)
-
-        # Clear all skills that the player doesn't have anymore
-        if player_skills:
-            query = f"DELETE FROM player_skills WHERE player_id = ? AND skill_id NOT IN ({placeholders_skills})"
-            params_skills = [player_id] + [skill[0] for skill in player_skills]
-            await db.execute(query, params_skills)
-        else:
-            await db.execute("DELETE FROM player_skills WHERE player_id = ?", (player_id,))
-
-        # Add or update the player's skills
-        for skill_id, current_level, current_exp in player_skills:
-            await db.execute('''
-                INSERT OR REPLACE INTO player_skills (player_id, skill_id, current_level, current_exp)
-                VALUES (?, ?, ?, ?)
-            ''', (player_id, skill_id, current_level, current_exp))
-
-    async def update_player_activities(self, db, player_id, player_activity):
-        # Clear all activities that player doesn't have anymore
-        if player_activity:
-            query = "DELETE FROM player_activities WHERE player_id = ? AND activity_id != ?"
-            params_activities = [player_id, player_activity.id]
-            await db.execute(query, params_activities)
-        else:
-            await db.execute("DELETE FROM player_activities WHERE player_id = ?", (player_id,))
-
-        # Add or update changed activities
-        if player_activity:
-            await db.execute('''
-                INSERT OR REPLACE INTO player_activities (player_id, activity_id)
-                VALUES (?, ?)
-            ''', (player_id, player_activity.id))
-
-    async def update_player_data(self, db, player_id, player):
-        # Check if the player exists in the database
-        async with db.execute('SELECT 1 FROM players WHERE player_id = ?', (player_id,)) as cursor:
-            found_player = await cursor.fetchone()
-
-        if found_player:
-            await db.execute('''
-            UPDATE players
-            SET player_display_name = ?, start_date = ?, last_update_time = ?
-            WHERE player_id == ?
-            ''', (player.display_name, player.start_date, player.last_update_time, player_id))
-        else:
-            await db.execute('''
-            INSERT INTO players (player_id, player_display_name, start_date, last_update_time)
-            VALUES (?, ?, ?, ?)
-            ''', (player_id, player.display_name, player.start_date, player.last_update_time))
+            saved_rows.append((player, rows))
+
+        # The whole transaction includes waiting for the writer and the commit
+        with metrics.timer('db_query_seconds', query='save_players'):
+            async with self.game_db.transaction() as db:
+                for table, params in deletes.items():
+                    if params:
+                        with metrics.timer('db_query_seconds', query=f'delete_{table}'):
+                            await db.executemany(PLAYER_ROW_DELETES[table], params)
+
+                for table, params in upserts.items():
+                    if params:
+                        with metrics.timer('db_query_seconds', query=f'upsert_{table}'):
+                            await db.executemany(PLAYER_ROW_UPSERTS[table], params)
+
+        for player, rows in saved_rows:
+            player.saved_rows = rows
 
     async def register_player(self, player_id: int, display_name: str):
         new_player = Player(player_id, display_name)
         new_player.add_currency(self.currencies[0].copy())
         new_player.add_skill(self.skills[0].copy())
         new_player.add_energy(self.energies[0].copy())
-        new_player.add_upgrade(self.upgrades[0].copy())
+        new_player.add_upgrade(self.upgrades[0])
 
         self.players[int(player_id)] = new_player
 
         self.recalculate_player_modifiers(new_player)
-        await self.player_to_database_update(player_id)
+        self.save_queue.mark_dirty(new_player.id, new_player)
 
     def player_stats_embed_message(self, player):
         embed_color = discord.Color.green() if player.current_activity else discord.Color.red()
@@ -1337,38 +1999,74 @@ class IncrementalGameCog(commands.Cog):
 
         return embed
 
+    def render_fragments(self):
+        # Text that only depends on the catalog is built once per catalog, so
+        # rendering only formats the numbers that belong to the player
+        if self.fragments_catalog is self.catalog:
+            return
+
+        self.upgrade_fragments = {
+            upgrade.id: (f"**{upgrade.name}**\n• Cost: `{upgrade.cost} {upgrade.cost_material}`\n", self.format_upgrade_text(upgrade))
+            for upgrade in self.upgrades.values()
+        }
+
+        self.activity_fragments = {}
+        for activity in self.activities.values():
+            requirements_text = f"\n• Requirements: `{'`, `'.join(activity.unlock_conditions)}`" if activity.unlock_conditions else ''
+
+            activity_energy = self.catalog.energies.get(activity.energy_id)
+
+            if activity_energy:
+                drain_text = f"\n• Drain: __{format_number(activity.energy_drain_rate)}__ {activity_energy.name.capitalize()} per second"
+            else:
+                drain_text = ''
+
+            activity_exp = f'\nGains `{format_number(activity.skill_exp_rate)}` {activity.skill.name} experience per second' if activity.skill else ''
+
+            self.activity_fragments[activity.id] = (
+                f"**{activity.name}**\n*{activity.description}*",
+                f"\n• Benefit: __{activity.output_amount:.2f}__ ",
+                f"{activity.output_item.capitalize()} per second",
+                f"{drain_text}{requirements_text}{activity_exp}",
+            )
+
+        self.fragments_catalog = self.catalog
+        self.embeds.clear()
+
+    def cached_embed(self, player, kind, page, render_key, render):
+        self.render_fragments()
+
+        key = (player.id, kind, page)
+        cached = self.embeds.get(key)
+        if cached and cached[0] == render_key:
+            self.embed_reuses += 1
+            return cached[1]
+
+        self.embed_renders += 1
+        embed = render(player, page)
+        self.embeds[key] = (render_key, embed)
+        return embed
+
     def player_shop_embed_message(self, player, page=1):
+        return self.cached_embed(player, 'shop', page, player.shop_render_key(), self.render_shop_embed)
+
+    def render_shop_embed(self, player, page=1):
         embed_color = discord.Color.green() if player.current_activity else discord.Color.red()
         formatted_currencies = []
         for currency in player.currencies.values():
             formatted_currencies.append(f"{currency.name.capitalize()}: {format_number(currency.amount)}/{format_number(currency.capacity)} (+{format_number(currency.last_gained)})")
 
-        missing_upgrades = self.get_missing_upgrades(player)
-
-        missing_upgrades_text = []
-
         if page < 1:
             page = 1
 
-        upgrades_count = 0
-        if missing_upgrades:
-            for upgrade, upgrades_left in missing_upgrades:
-                if not self.check_conditions(player, upgrade.unlock_conditions):
-                    continue
-                upgrades_count += 1
-
-                start_index = (page - 1) * UPGRADES_PER_PAGE
-                end_index = page * UPGRADES_PER_PAGE
+        shop_state = self.get_shop_state(player)
 
-                if start_index < upgrades_count <= end_index:
-                    missing_upgrades_text.append(
-                        f"**{upgrade.name}**\n"
-                        f"• Cost: `{upgrade.cost} {upgrade.cost_material}`\n"
-                        f"• Remaining: `{upgrades_left}`"
-                        f"{self.format_upgrade_text(upgrade)}"
-                    )
+        missing_upgrades_text = []
+        for upgrade, upgrades_left in shop_state.page(page, UPGRADES_PER_PAGE):
+            header, details = self.upgrade_fragments[upgrade.id]
+            missing_upgrades_text.append(f"{header}• Remaining: `{upgrades_left}`{details}")
 
-        pages = max(1, math.ceil(upgrades_count / UPGRADES_PER_PAGE))
+        pages = shop_state.page_count(UPGRADES_PER_PAGE)
 
         embed = discord.Embed(
             title=f"🛒 Upgrade shop - Page {page}/{pages}",
@@ -1387,53 +2085,29 @@ class IncrementalGameCog(commands.Cog):
         return embed
 
     def player_activities_embed_message(self, player, page=1):
-        embed_color = discord.Color.green() if player.current_activity else discord.Color.red()
+        return self.cached_embed(player, 'activities', page, player.activities_render_key(), self.render_activities_embed)
 
-        activities = self.get_available_activities(player)
+    def render_activities_embed(self, player, page=1):
+        embed_color = discord.Color.green() if player.current_activity else discord.Color.red()
 
-        activities_count = 0
+        activities_state = self.get_activities_state(player)
 
         activity_details = []
 
-        for activity in activities:
+        for activity in activities_state.page(page, ACTIVITIES_PER_PAGE):
+            modifiers = player.stat_modifiers.get(activity.gain_stat, {'increase': 0, 'multiplier': 1.0})
 
-            activities_count += 1
+            modified_output = (activity.output_amount + modifiers['increase']) * modifiers['multiplier']
 
-            start_index = (page - 1) * ACTIVITIES_PER_PAGE
-            end_index = page * ACTIVITIES_PER_PAGE
+            modified_output_text = f" `+{(modified_output - activity.output_amount):.2f}` " if modified_output - activity.output_amount > 0 else ''
 
-            if start_index < activities_count <= end_index:
-                stat_key = f"{activity.output_item}.gain"
+            head, benefit_prefix, benefit_suffix, tail = self.activity_fragments[activity.id]
 
-                modifiers = player.stat_modifiers.get(stat_key, {'increase': 0, 'multiplier': 1.0})
+            benefits_text = f"{benefit_prefix}{modified_output_text}{benefit_suffix}" if activity.output_item else ''
 
-                modified_output = (activity.output_amount + modifiers['increase']) * modifiers['multiplier']
+            activity_details.append(f"{head}{benefits_text}{tail}")
 
-                modified_output_text = f" `+{(modified_output - activity.output_amount):.2f}` " if modified_output - activity.output_amount > 0 else ''
-
-                requirements_text = f"\n• Requirements: `{'`, `'.join(activity.unlock_conditions)}`" if activity.unlock_conditions else ''
-
-                benefits_text = f"\n• Benefit: __{activity.output_amount:.2f}__ {modified_output_text}{activity.output_item.capitalize()} per second" if activity.output_item else ''
-
-                activity_energy = next((energy for energy in self.get_energies().values() if energy and activity.energy_type and activity.energy_type.lower() == energy.name.lower()), None)
-
-                if activity_energy:
-                    drain_text = f"\n• Drain: __{format_number(activity.energy_drain_rate)}__ {activity_energy.name.capitalize()} per second"
-                else:
-                    drain_text = ''
-
-                activity_exp = f'\nGains `{format_number(activity.skill_exp_rate)}` {activity.skill.name} experience per second' if activity.skill else ''
-
-                activity_details.append(
-                    f"**{activity.name}**"
-                    f"\n*{activity.description}*"
-                    f"{benefits_text}"
-                    f"{drain_text}"
-                    f"{requirements_text}"
-                    f"{activity_exp}"
-                )
-
-        pages = max(1, math.ceil(activities_count / ACTIVITIES_PER_PAGE))
+        pages = activities_state.page_count(ACTIVITIES_PER_PAGE)
 
         embed = discord.Embed(
             title=f"🏃 Available Activities - Page {page}/{pages}",
@@ -1495,10 +2169,33 @@ class IncrementalGameCog(commands.Cog):
             return f"• Requires {skill.capitalize()} Level {level}"
         return f"• Requires {condition}"
 
+    def get_shop_state(self, player) -> ShopState:
+        # The embed and the buttons of one shop page both come here, the
+        # second call and every click that buys nothing reuse the first list
+        self.recalculate_player_modifiers(player)
+
+        shop_state = player.shop_state
+        if shop_state is None or not shop_state.is_current(self.catalog, player.modifier_signature):
+            level_conditions = self.catalog.upgrade_level_conditions
+            upgrades = [
+                (upgrade, upgrades_left) for upgrade, upgrades_left in self.get_missing_upgrades(player)
+                if player.meets_level_conditions(level_conditions[upgrade.id])
+            ]
+            shop_state = player.shop_state = ShopState(self.catalog, player.modifier_signature, upgrades)
+
+        return shop_state
+
+    def get_activities_state(self, player) -> MenuState:
+        # Rebuilt only when an upgrade changes the player's unlocks
+        activities_state = player.activities_state
+        if activities_state is None or not activities_state.is_current(self.catalog, player.unlock_conditions):
+            activities_state = player.activities_state = MenuState(self.catalog, player.unlock_conditions, self.get_available_activities(player))
+
+        return activities_state
+
     def get_missing_upgrades(self, player) -> list[tuple[Upgrade, int]]:
         missing_upgrades = []
-        upgrades_list = self.get_upgrades()
-        for id, upgrade in upgrades_list.items():
+        for id, upgrade in self.upgrades.items():
             if id in player.upgrades:
                 upgrades_left = player.upgrades[id].max_purchases - player.upgrades[id].count
             else:
@@ -1510,36 +2207,11 @@ class IncrementalGameCog(commands.Cog):
         return missing_upgrades
 
     def get_available_activities(self, player) -> list[Activity]:
-        activities_list = []
-        for activity in self.activities.values():
-            if activity.unlock_conditions:
-                if not all(condition in player.unlock_conditions for condition in activity.unlock_conditions):
-                    continue
-
-            activities_list.append(activity)
-
-        return activities_list
-
-    def check_conditions(self, player: Player, conditions: list) -> bool:
-
-        for condition in conditions:
-            if condition.startswith('level.'):
-                _, skill_name, required_level = condition.split('.')
-
-                skill = next((s for s in player.skills.values() if s.name.lower() == skill_name.lower()), None)
-
-                if not skill or skill.current_level < int(required_level):
-                    return False
-
-            elif condition.startswith('energy.'):
-                pass
-            elif condition.startswith('gold.'):
-                pass
-
-        return True
+        unlock_conditions = self.catalog.activity_unlock_conditions
+        return [activity for activity in self.activities.values() if unlock_conditions[activity.id] <= player.unlock_conditions]
 
     async def save_channels_to_db(self):
-        async with aiosqlite.connect(SERVER_DB_LOCATION) as db:
+        async with self.server_db.transaction() as db:
             for server_id, values in self.allowed_channels.items():
                 server_name = values["name"]
                 channels = values["channels"]
@@ -1572,8 +2244,6 @@ class IncrementalGameCog(commands.Cog):
                                 VALUES (?, ?, ?)
                             ''', (channel_id, server_id, channel_name))
 
-            await db.commit()
-
 
 @commands.command(name='sync')
 async def tree_sync(ctx):
@@ -1633,358 +2303,134 @@ def format_number(number, sig_figs=3):
         return value_str
 
 
-async def create_energies_table(db_location):
-    async with aiosqlite.connect(db_location) as db:
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS energies (
-                energy_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                max_energy REAL,
-                recovery_rate REAL
+async def create_player_energy_table(db):
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS player_energies (
+            player_id INTEGER,
+            energy_id INTEGER,
+            current_energy REAL,
+            PRIMARY KEY (player_id, energy_id)
+    )
+    ''')
+
+
+async def create_player_skills_table(db):
+    # Create a table if it doesn't exist
+    await db.execute('''
+    CREATE TABLE IF NOT EXISTS player_skills (
+        player_id INTEGER NOT NULL,
+        skill_id INTEGER NOT NULL,
+        current_level INTEGER NOT NULL,
+        current_exp REAL NOT NULL,
+        PRIMARY KEY (player_id, skill_id)
+    )
+    ''')
+
+
+async def create_player_activities_table(db):
+    # Create a table if it doesn't exist
+    await db.execute('''
+    CREATE TABLE IF NOT EXISTS player_activities (
+        player_id INTEGER NOT NULL,
+        activity_id INTEGER NOT NULL,
+        PRIMARY KEY (player_id, activity_id)
+    )
+    ''')
+
+
+async def create_player_upgrades_table(db):
+    # Create a table if it doesn't exist
+    await db.execute('''
+    CREATE TABLE IF NOT EXISTS player_upgrades (
+        player_id INTEGER NOT NULL,
+        upgrade_id INTEGER NOT NULL,
+        count INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (player_id, upgrade_id)
+    )
+    ''')
+
+
+async def create_player_currencies_table(db):
+    # Create a table if it doesn't exist
+    await db.execute('''
+    CREATE TABLE IF NOT EXISTS player_currencies (
+        player_id INTEGER NOT NULL,
+        currency_id INTEGER NOT NULL,
+        amount DOUBLE NOT NULL DEFAULT 0,
+        PRIMARY KEY (player_id, currency_id)
+    )
+    ''')
+
+
+async def create_items_table(db):
+    # Create a table if it doesn't exist
+    await db.execute('''
+    CREATE TABLE IF NOT EXISTS items (
+        item_id INTEGER PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL
+    )
+    ''')
+
+    await db.execute('''
+    CREATE TABLE IF NOT EXISTS attributes (
+        attribute_id INTEGER PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL
+    )
+    ''')
+
+    await db.execute('''
+    CREATE TABLE IF NOT EXISTS item_attributes (
+        item_id INTEGER NOT NULL,
+        attribute_id INTEGER NOT NULL,
+        value DOUBLE NOT NULL,
+        PRIMARY KEY (item_id, attribute_id),
+        FOREIGN KEY (item_id) REFERENCES items(item_id),
+        FOREIGN KEY (attribute_id) REFERENCES attributes(attribute_id)
+    )
+    ''')
+
+
+async def create_player_items_table(db):
+    # Create a table if it doesn't exist
+    await db.execute('''
+    CREATE TABLE IF NOT EXISTS player_items (
+        player_id INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        count INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (player_id, upgrade_id),
+        FOREIGN KEY (item_id) REFERENCES ITEMS(item_id)
+    )
+    ''')
+
+
+async def create_players_table(db):
+    # Create a table if it doesn't exist
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS players (
+            player_id INTEGER PRIMARY KEY,
+            player_display_name TEXT NOT NULL,
+            start_date TEXT,
+            last_update_time TEXT
         )
-        ''')
-        await db.commit()
-
-
-async def create_player_energy_table(db_location):
-    async with aiosqlite.connect(db_location) as db:
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS player_energies (
-                player_id INTEGER,
-                energy_id INTEGER,
-                current_energy REAL,
-                PRIMARY KEY (player_id, energy_id),
-                FOREIGN KEY (energy_id) REFERENCES energies(energy_id)
-        )
-        ''')
-        await db.commit()
-
-
-async def create_skills_table(db_location):
-    async with aiosqlite.connect(db_location) as db:
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS skills (
-                skill_id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                description TEXT,
-                start_level INTEGER NOT NULL,
-                max_level INTEGER NOT NULL,
-                base_exp_requirement REAL NOT NULL,
-                scaling_factor REAL NOT NULL,
-                exp_formula TEXT
-        )
-        ''')
-
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS skill_effects (
-            id INTEGER PRIMARY KEY,
-            skill_id INTEGER NOT NULL,
-            stat TEXT NOT NULL,
-            modifier_type TEXT NOT NULL,
-            modifier_value REAL NOT NULL,
-            UNIQUE (skill_id, stat, modifier_type),
-            FOREIGN KEY (skill_id) REFERENCES skills (skill_id) ON DELETE CASCADE
-        )
-        ''')
-        await db.commit()
-
-
-async def create_player_skills_table(database_location):
-    async with aiosqlite.connect(database_location) as db:
-        # Create a table if it doesn't exist
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS player_skills (
-            player_id INTEGER NOT NULL,
-            skill_id INTEGER NOT NULL,
-            current_level INTEGER NOT NULL,
-            current_exp REAL NOT NULL,
-            PRIMARY KEY (player_id, skill_id),
-            FOREIGN KEY (skill_id) REFERENCES skills(skill_id)
-        )
-        ''')
-        await db.commit()
-
-
-async def create_player_activities_table(database_location):
-    async with aiosqlite.connect(database_location) as db:
-        # Create a table if it doesn't exist
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS player_activities (
-            player_id INTEGER NOT NULL,
-            activity_id INTEGER NOT NULL,
-            PRIMARY KEY (player_id, activity_id),
-            FOREIGN KEY (activity_id) REFERENCES activities(activity_id)
-        )
-        ''')
-        await db.commit()
-
-
-async def create_activities_table(database_location):
-    async with aiosqlite.connect(database_location) as db:
-        # Create a table if it doesn't exist
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS activities (
-            activity_id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            icon TEXT,
-            output_item TEXT NOT NULL,
-            output_amount REAL NOT NULL,
-            energy_type TEXT,
-            energy_drain_rate REAL,
-            skill TEXT,
-            skill_exp_rate REAL,
-            unlock_conditions TEXT,
-            description TEXT,
-            status_description TEXT
-        )
-        ''')
-        await db.commit()
+    ''')
 
 
-async def create_player_upgrades_table(database_location):
-    async with aiosqlite.connect(database_location) as db:
-        # Create a table if it doesn't exist
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS player_upgrades (
-            player_id INTEGER NOT NULL,
-            upgrade_id INTEGER NOT NULL,
-            count INTEGER NOT NULL DEFAULT 1,
-            PRIMARY KEY (player_id, upgrade_id),
-            FOREIGN KEY (upgrade_id) REFERENCES upgrades(upgrade_id)
+async def create_server_channel_table(db):
+    # Create a table if it doesn't exist
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS servers (
+            server_id BIGINT PRIMARY KEY,
+            server_name TEXT
         )
-        ''')
-        await db.commit()
-
-
-async def create_upgrades_table(database_location):
-    async with aiosqlite.connect(database_location) as db:
-        # Create a table if it doesn't exist
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS upgrades (
-            upgrade_id INTEGER PRIMARY KEY,
-            name TEXT UNIQUE,
-            stat TEXT,
-            modifier_type TEXT,
-            modifier_value INTEGER,
-            cost_material TEXT,
-            cost INTEGER,
-            max_purchases INTEGER,
-            description TEXT
-        )
-        ''')
-
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS upgrade_unlocks (
-            id INTEGER PRIMARY KEY,
-            upgrade_id INTEGER NOT NULL,
-            condition TEXT NOT NULL,
-            UNIQUE (upgrade_id, condition),
-            FOREIGN KEY (upgrade_id) REFERENCES upgrades (upgrade_id) ON DELETE CASCADE
-        )
-        ''')
-
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS upgrade_effects (
-            id INTEGER PRIMARY KEY,
-            upgrade_id INTEGER NOT NULL,
-            stat TEXT NOT NULL,
-            modifier_type TEXT NOT NULL,
-            modifier_value REAL NOT NULL,
-            UNIQUE (upgrade_id, stat, modifier_type),
-            FOREIGN KEY (upgrade_id) REFERENCES upgrades (upgrade_id) ON DELETE CASCADE
-        )
-        ''')
-
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS upgrade_unlock_conditions (
-            upgrade_id INTEGER,
-            condition TEXT,
-            PRIMARY KEY (upgrade_id, condition),
-            FOREIGN KEY (upgrade_id) REFERENCES upgrades (upgrade_id) ON DELETE CASCADE
-        )
-        ''')
-
-        await db.commit()
-
-
-async def create_player_currencies_table(database_location):
-    async with aiosqlite.connect(database_location) as db:
-        # Create a table if it doesn't exist
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS player_currencies (
-            player_id INTEGER NOT NULL,
-            currency_id INTEGER NOT NULL,
-            amount DOUBLE NOT NULL DEFAULT 0,
-            PRIMARY KEY (player_id, currency_id),
-            FOREIGN KEY (currency_id) REFERENCES currencies(currency_id)
-        )
-        ''')
-        await db.commit()
-
-
-async def create_currencies_table(database_location):
-    async with aiosqlite.connect(database_location) as db:
-        # Create a table if it doesn't exist
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS currencies (
-            currency_id INTEGER PRIMARY KEY,
-            name TEXT UNIQUE NOT NULL,
-            default_capacity INTEGER
-        )
-        ''')
-        await db.commit()
-
-
-async def create_items_table(database_location):
-    async with aiosqlite.connect(database_location) as db:
-        # Create a table if it doesn't exist
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS items (
-            item_id INTEGER PRIMARY KEY,
-            name TEXT UNIQUE NOT NULL
-        )
-        ''')
-
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS attributes (
-            attribute_id INTEGER PRIMARY KEY,
-            name TEXT UNIQUE NOT NULL
-        )
-        ''')
-
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS item_attributes (
-            item_id INTEGER NOT NULL,
-            attribute_id INTEGER NOT NULL,
-            value DOUBLE NOT NULL,
-            PRIMARY KEY (item_id, attribute_id),
-            FOREIGN KEY (item_id) REFERENCES items(item_id),
-            FOREIGN KEY (attribute_id) REFERENCES attributes(attribute_id)
-        )
-        ''')
-        await db.commit()
-
-
-async def create_player_items_table(database_location):
-    async with aiosqlite.connect(database_location) as db:
-        # Create a table if it doesn't exist
-        await db.execute('''
-        CREATE TABLE IF NOT EXISTS player_items (
-            player_id INTEGER NOT NULL,
-            item_id INTEGER NOT NULL,
-            count INTEGER NOT NULL DEFAULT 1,
-            PRIMARY KEY (player_id, upgrade_id),
-            FOREIGN KEY (item_id) REFERENCES ITEMS(item_id)
+    ''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS channels (
+            channel_id BIGINT PRIMARY KEY,
+            server_id BIGINT,
+            channel_name TEXT,
+            FOREIGN KEY (server_id) REFERENCES servers(server_id)
         )
-        ''')
-        await db.commit()
-
-
-async def create_players_table(database_location):
-    async with aiosqlite.connect(database_location) as db:
-        # Create a table if it doesn't exist
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS players (
-                player_id INTEGER PRIMARY KEY,
-                player_display_name TEXT NOT NULL,
-                start_date TEXT,
-                last_update_time TEXT
-            )
-        ''')
-        await db.commit()
-
-
-async def create_server_channel_table(database_location):
-    async with aiosqlite.connect(database_location) as db:
-        # Create a table if it doesn't exist
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS servers (
-                server_id BIGINT PRIMARY KEY,
-                server_name TEXT
-            )
-        ''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS channels (
-                channel_id BIGINT PRIMARY KEY,
-                server_id BIGINT,
-                channel_name TEXT,
-                FOREIGN KEY (server_id) REFERENCES servers(server_id)
-            )
-        ''')
-        await db.commit()
-
-
-async def update_energies_from_json_to_db(database_location):
-    with open(os.path.join(game_data_folder, 'energies.json'), encoding='utf-8') as file:
-        energies_data = json.load(file)
-
-    async with aiosqlite.connect(database_location) as db:
-        for energy in energies_data:
-            await db.execute('''
-                INSERT OR REPLACE INTO energies (energy_id, name, max_energy, recovery_rate)
-                VALUES (?, ?, ?, ?)
-            ''', (energy['id'], energy['name'], energy['max_energy'], energy['recovery_rate']))
-        await db.commit()
-
-
-async def update_skills_from_json_to_db(database_location):
-    with open(os.path.join(game_data_folder, 'skills.json'), encoding='utf-8') as file:
-        skills_data = json.load(file)
-
-    async with aiosqlite.connect(database_location) as db:
-        for skill in skills_data:
-            await db.execute('''
-                INSERT OR REPLACE INTO skills (skill_id, name, description, start_level, max_level, base_exp_requirement, scaling_factor, exp_formula)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (skill['id'], skill['name'], skill['description'], skill['start_level'], skill['max_level'], skill['base_exp_requirement'], skill['scaling_factor'], skill['exp_formula']))
-
-            if 'effects' in skill and skill['effects']:
-                for stat, effect in skill['effects'].items():
-                    await db.execute('''
-                        INSERT OR REPLACE INTO skill_effects (
-                            skill_id, stat, modifier_type, modifier_value
-                        )
-                        VALUES (?, ?, ?, ?)
-                    ''', (
-                        skill['id'], stat, effect['modifier_type'], effect['modifier_value']
-                    ))
-
-        await db.commit()
-
-
-async def update_activities_from_json_to_db(database_location):
-    with open(os.path.join(game_data_folder, 'activities.json'), encoding='utf-8') as file:
-        activities = json.load(file)
-
-    async with aiosqlite.connect(database_location) as db:
-        for activity in activities:
-            await db.execute('''
-                INSERT OR REPLACE INTO activities (activity_id, name, icon, output_item, output_amount, energy_type, energy_drain_rate, skill, skill_exp_rate, unlock_conditions, description, status_description)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (activity['id'], activity['name'], activity['icon'],
-                  activity['output_item'], activity['output_amount'],
-                  activity['energy_type'],
-                  activity['energy_drain_rate'],
-                  activity['skill'],
-                  activity['skill_exp_rate'],
-                  ','.join(activity['unlock_conditions']),
-                  activity['description'],
-                  activity['status_description']))
-        await db.commit()
-
-
-async def update_currencies_from_json_to_db(database_location):
-    with open(os.path.join(game_data_folder, 'currencies.json')) as file:
-        currencies = json.load(file)
-
-    async with aiosqlite.connect(database_location) as db:
-        for currency in currencies:
-            await db.execute('''
-                INSERT OR IGNORE INTO currencies (currency_id, name, default_capacity)
-                VALUES (?, ?, ?)
-            ''', (currency['id'], currency['name'], currency['capacity']))
-
-        await db.commit()
+    ''')
 
 
 # async def update_items_from_json_to_db(database_location):
@@ -2002,105 +2448,74 @@ async def update_currencies_from_json_to_db(database_location):
 #         await db.commit()
 
 
-async def update_upgrades_from_json_to_db(database_location):
-    with open(os.path.join(game_data_folder, 'upgrades.json')) as file:
-        upgrades = json.load(file)
-
+async def create_game_schema(database_location):
     async with aiosqlite.connect(database_location) as db:
-        for upgrade in upgrades:
-            await db.execute('''
-                INSERT OR REPLACE INTO upgrades (upgrade_id, name,
-                cost_material, cost, max_purchases,
-                description)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (upgrade['id'], upgrade['name'],
-                  upgrade['cost_material'], upgrade['cost'],
-                  upgrade['max_purchases'], upgrade['description']))
-
-            if 'effects' in upgrade and upgrade['effects']:
-                for stat, effect in upgrade['effects'].items():
-                    await db.execute('''
-                        INSERT OR REPLACE INTO upgrade_effects (
-                            upgrade_id, stat, modifier_type, modifier_value
-                        )
-                        VALUES (?, ?, ?, ?)
-                    ''', (
-                        upgrade['id'], stat, effect['modifier_type'], effect['modifier_value']
-                    ))
-
-            if upgrade['unlocks']:
-                for condition in upgrade['unlocks']:
-                    async with db.execute('''
-                        SELECT 1 FROM upgrade_unlocks WHERE upgrade_id = ? AND condition = ?
-                    ''', (upgrade['id'], condition)) as cursor:
-                        exists = await cursor.fetchone()
-
-                    if not exists:
-                        await db.execute('''
-                            INSERT OR REPLACE INTO upgrade_unlocks (upgrade_id, condition)
-                            VALUES (?, ?)
-                        ''', (upgrade['id'], condition))
-
-            if upgrade['unlock_conditions']:
-                for condition in upgrade['unlock_conditions']:
-                    async with db.execute('''
-                        SELECT 1 FROM upgrade_unlock_conditions WHERE upgrade_id = ? AND condition = ?
-                    ''', (upgrade['id'], condition)) as cursor:
-                        exists = await cursor.fetchone()
+        await db.execute('BEGIN')
 
-                    if not exists:
-                        await db.execute('''
-                            INSERT OR REPLACE INTO upgrade_unlock_conditions (upgrade_id, condition)
-                            VALUES (?, ?)
-                        ''', (upgrade['id'], condition))
+        await create_players_table(db)
 
-            await db.commit()
+        await create_items_table(db)
+        # await update_items_from_json_to_db(DB_NAME)
+        # await create_player_items_table(DB_NAME)
 
+        await create_player_activities_table(db)
+        await create_player_currencies_table(db)
+        await create_player_upgrades_table(db)
+        await create_player_skills_table(db)
+        await create_player_energy_table(db)
 
-async def setup(bot):
-    global tree
-    tree = bot.tree
-    bot.add_command(tree_sync)
+        await db.commit()
 
-    # create table if not exist
 
-    await create_server_channel_table(SERVER_DB_LOCATION)
+async def create_server_schema(database_location):
+    async with aiosqlite.connect(database_location) as db:
+        await db.execute('BEGIN')
 
-    await create_players_table(GAME_DB_LOCATION)
+        await create_server_channel_table(db)
 
-    await create_items_table(GAME_DB_LOCATION)
-    # await update_items_from_json_to_db(DB_NAME)
-    # await create_player_items_table(DB_NAME)
+        await db.commit()
 
-    await create_activities_table(GAME_DB_LOCATION)
-    await update_activities_from_json_to_db(GAME_DB_LOCATION)
-    await create_player_activities_table(GAME_DB_LOCATION)
 
-    await create_currencies_table(GAME_DB_LOCATION)
-    await update_currencies_from_json_to_db(GAME_DB_LOCATION)
-    await create_player_currencies_table(GAME_DB_LOCATION)
+@contextmanager
+def startup_phase(timings, name):
+    phase_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - phase_start
 
-    await create_upgrades_table(GAME_DB_LOCATION)
-    await update_upgrades_from_json_to_db(GAME_DB_LOCATION)
-    await create_player_upgrades_table(GAME_DB_LOCATION)
 
-    await create_skills_table(GAME_DB_LOCATION)
-    await update_skills_from_json_to_db(GAME_DB_LOCATION)
-    await create_player_skills_table(GAME_DB_LOCATION)
+async def setup(bot):
+    global tree
+    tree = bot.tree
+    bot.add_command(tree_sync)
 
-    await create_energies_table(GAME_DB_LOCATION)
-    await update_energies_from_json_to_db(GAME_DB_LOCATION)
-    await create_player_energy_table(GAME_DB_LOCATION)
+    timings = {}
 
+    # The catalog comes straight from game_data, so a broken file stops the
+    # load before anything touches the databases
     game_cog = IncrementalGameCog(bot)
-    await bot.add_cog(game_cog)
+    with startup_phase(timings, 'catalog load'):
+        game_cog.load_catalog()
+
+    # create table if not exist, both databases at once
+    with startup_phase(timings, 'schema'):
+        await asyncio.gather(
+            create_game_schema(GAME_DB_LOCATION),
+            create_server_schema(SERVER_DB_LOCATION)
+        )
+
+    with startup_phase(timings, 'connections'):
+        await game_cog.open_databases()
+        await bot.add_cog(game_cog)
+        bot.add_dynamic_items(GameButton)
 
-    await game_cog.get_server_channels_from_db()
+    with startup_phase(timings, 'channels'):
+        await game_cog.get_server_channels_from_db()
 
-    await game_cog.get_currencies_from_db()
-    await game_cog.get_upgrades_from_db()
-    await game_cog.get_skills_from_db()
-    await game_cog.get_activities_from_db()
-    await game_cog.get_energies_from_db()
+    if METRICS_PORT:
+        game_cog.metrics_runner = await start_metrics_server(metrics, METRICS_PORT)
 
     game_cog.initialize()
+
+    print('Startup: ' + ', '.join(f'{name} {seconds * 1000:.0f}ms' for name, seconds in timings.items()))
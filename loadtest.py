@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+from functions import IncrementalGameCog, create_game_schema, create_server_schema, metrics
+from database import Database
+from metrics import Histogram
+from views import GameButton
+
+# Load generator for capacity estimates. Simulated players run /play and then
+# click through the menus of their own message, with random think time between
+# clicks, against temporary databases. No Discord connection needed:
+#
+#   python loadtest.py --players 2000 --duration 60
+#
+# The catalog comes from game_data, so run it from the repository folder.
+
+DEFAULT_PLAYERS = 500
+DEFAULT_DURATION = 30.0
+# Mean seconds a player looks at a menu before the next click
+DEFAULT_THINK_TIME = 3.0
+# Seconds over which the players arrive, all at once is not realistic either
+DEFAULT_RAMP_UP = 5.0
+
+message_ids = itertools.count(1)
+
+
+class LoadBot:
+    # Stands in for the bot, GameButton asks it for the cog
+    def __init__(self, cog):
+        self.cog = cog
+
+    def get_cog(self, name):
+        return self.cog
+
+
+class LoadUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.display_name = f'load{user_id}'
+
+
+class LoadMessage:
+    def __init__(self):
+        self.id = next(message_ids)
+
+
+class LoadResponse:
+    # Stands in for discord.InteractionResponse, keeps the view the cog
+    # answered with so the player can click one of its buttons next
+    def __init__(self, client):
+        self.client = client
+
+    async def edit_message(self, content=None, embed=None, view=None):
+        if view is not None:
+            self.client.view = view
+
+    async def send_message(self, content=None, ephemeral=False, **kwargs):
+        self.client.errors += 1
+
+    async def defer(self, **kwargs):
+        pass
+
+    def is_done(self):
+        return False
+
+
+class LoadInteraction:
+    def __init__(self, client):
+        self.client = client.bot
+        self.user = client.user
+        self.message = client.message
+        self.response = LoadResponse(client)
+
+
+class LoadContext:
+    # Stands in for commands.Context of a /play invocation
+    def __init__(self, client):
+        self.client = client
+        self.author = client.user
+
+    async def send(self, content=None, embed=None, view=None):
+        self.client.message = LoadMessage()
+        self.client.view = view
+        return self.client.message
+
+
+class LoadClient:
+    def __init__(self, cog, user_id, think_time, rng):
+        self.cog = cog
+        self.bot = LoadBot(cog)
+        self.user = LoadUser(user_id)
+        self.think_time = think_time
+        self.rng = rng
+        self.message = None
+        self.view = None
+        self.errors = 0
+
+    async def click(self, button):
+        interaction = LoadInteraction(self)
+        if await button.interaction_check(interaction):
+            await button.callback(interaction)
+
+    async def timed(self, action, call, latencies):
+        start = time.perf_counter()
+        await call
+        elapsed = time.perf_counter() - start
+
+        histogram = latencies.get(action)
+        if histogram is None:
+            histogram = latencies[action] = Histogram()
+        histogram.observe(elapsed)
+
+    async def run(self, deadline, latencies):
+        await self.timed('play', self.cog.play.callback(self.cog, LoadContext(self)), latencies)
+
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+
+            buttons = [item for item in self.view.children if isinstance(item, GameButton)]
+            if not buttons:
+                break
+
+            button = self.rng.choice(buttons)
+            await self.timed(button.action, self.click(button), latencies)
+
+
+def percentile_ms(histogram, q):
+    return histogram.quantile(q) * 1000
+
+
+async def run_load(players, duration, think_time, ramp_up, seed):
+    rng = random.Random(seed)
+    latencies: dict[str, Histogram] = {}
+
+    with tempfile.TemporaryDirectory() as folder:
+        game_location = os.path.join(folder, 'game.db')
+        server_location = os.path.join(folder, 'server.db')
+        await create_game_schema(game_location)
+        await create_server_schema(server_location)
+
+        cog = IncrementalGameCog(None)
+        cog.load_catalog()
+        cog.game_db = Database(game_location, readers=4)
+        cog.server_db = Database(server_location, readers=1)
+        await cog.open_databases()
+        cog.initialize()
+
+        clients = [LoadClient(cog, user_id, think_time, random.Random(rng.random())) for user_id in range(1, players + 1)]
+
+        async def arrive(client):
+            await asyncio.sleep(rng.uniform(0, ramp_up))
+            await client.run(deadline, latencies)
+
+        start = time.monotonic()
+        deadline = start + ramp_up + duration
+        results = await asyncio.gather(*(arrive(client) for client in clients), return_exceptions=True)
+        elapsed = time.monotonic() - start
+
+        await cog.cog_unload()
+
+    failures = [result for result in results if isinstance(result, BaseException)]
+    return cog, latencies, elapsed, failures, sum(client.errors for client in clients)
+
+
+def report(cog, latencies, elapsed, failures, errors):
+    total = Histogram()
+    for histogram in latencies.values():
+        total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+        total.count += histogram.count
+        total.sum += histogram.sum
+
+    print(f"{total.count} interactions in {elapsed:.1f}s, {total.count / elapsed:.1f} per second")
+    print(f"{'action':<20}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for action, histogram in sorted(latencies.items()) + [('all', total)]:
+        print(f"{action:<20}{histogram.count:>8}{percentile_ms(histogram, 0.5):>10.2f}{percentile_ms(histogram, 0.99):>10.2f}")
+
+    print()
+    print("p99 ms per phase")
+    for callback in metrics.label_values('interaction_phase_seconds', 'callback'):
+        phases = ', '.join(
+            f"{phase} {percentile_ms(metrics.histogram('interaction_phase_seconds', callback=callback, phase=phase), 0.99):.2f}"
+            for phase in metrics.label_values('interaction_phase_seconds', 'phase')
+            if metrics.histogram('interaction_phase_seconds', callback=callback, phase=phase)
+        )
+        print(f"  {callback}: {phases}")
+
+    db = cog.game_db
+    print()
+    print(f"SQLite lock waits: read {db.read_wait_seconds * 1000:.1f}ms over {db.read_waits} "
+          f"(mean {db.read_wait_seconds * 1000 / max(db.read_waits, 1):.3f}ms), "
+          f"write {db.write_wait_seconds * 1000:.1f}ms over {db.write_waits} "
+          f"(mean {db.write_wait_seconds * 1000 / max(db.write_waits, 1):.3f}ms)")
+    print(f"Embeds reused {cog.embed_reuses}, rendered {cog.embed_renders}")
+
+    if errors:
+        print(f"{errors} interactions answered with an error message")
+    for failure in failures[:5]:
+        print(f"Player task failed: {failure!r}")
+
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate concurrent players clicking through the game menus.')
+    parser.add_argument('--players', type=int, default=DEFAULT_PLAYERS, help='number of simulated players')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help='seconds to keep clicking after the ramp up')
+    parser.add_argument('--think', type=float, default=DEFAULT_THINK_TIME, help='mean seconds between clicks of one player')
+    parser.add_argument('--ramp-up', type=float, default=DEFAULT_RAMP_UP, help='seconds over which players arrive')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    return report(*asyncio.run(run_load(args.players, args.duration, args.think, args.ramp_up, args.seed)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
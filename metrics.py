@@ -0,0 +1,142 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import time
+from typing import Optional
+
+# Upper bounds in seconds, the last bucket catches everything slower
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The interaction being handled and the phase it is in. Every interaction
+# runs in its own task, so these never leak from one to another.
+current_callback: ContextVar[Optional[str]] = ContextVar('current_callback', default=None)
+current_phase: ContextVar[Optional[str]] = ContextVar('current_phase', default=None)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket the quantile falls in
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+
+        return self.buckets[-1]
+
+
+class Metrics:
+    # Latency histograms keyed by metric name and label values. Recording is
+    # a perf_counter call and a bisect, cheap enough for every interaction.
+    def __init__(self):
+        self.histograms: dict[tuple[str, tuple[tuple[str, str], ...]], Histogram] = {}
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def histogram(self, name, **labels) -> Optional[Histogram]:
+        return self.histograms.get((name, tuple(sorted(labels.items()))))
+
+    def label_values(self, name, label):
+        return sorted({dict(labels)[label] for metric, labels in self.histograms if metric == name and label in dict(labels)})
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def phase(self, name):
+        # Time spent in one phase of the current interaction. Phases don't
+        # nest: work done inside another phase counts towards the outer one.
+        callback = current_callback.get()
+        if callback is None or current_phase.get() is not None:
+            yield
+            return
+
+        token = current_phase.set(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('interaction_phase_seconds', time.perf_counter() - start, callback=callback, phase=name)
+            current_phase.reset(token)
+
+    def instrument(self, function):
+        # Times a whole callback and names it for the phases inside
+        @wraps(function)
+        async def wrapper(*args, **kwargs):
+            token = current_callback.set(function.__name__)
+            start = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                self.observe('interaction_seconds', time.perf_counter() - start, callback=function.__name__)
+                current_callback.reset(token)
+
+        return wrapper
+
+    def prometheus_text(self):
+        lines = []
+        described = set()
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            if name not in described:
+                described.add(name)
+                lines.append(f'# TYPE {name} histogram')
+
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            prefix = label_text + ',' if label_text else ''
+
+            cumulative = 0
+            for bucket, bucket_count in zip(histogram.buckets, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{prefix}le="{bucket}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{{label_text}}} {histogram.sum}')
+            lines.append(f'{name}_count{{{label_text}}} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+async def start_metrics_server(metrics: Metrics, port, host='127.0.0.1'):
+    # Prometheus scrape endpoint at /metrics. aiohttp already comes with
+    # discord.py; returns the runner so the caller can clean it up.
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=metrics.prometheus_text(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    return runner
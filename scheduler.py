@@ -0,0 +1,84 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Optional
+
+
+class EventScheduler:
+    # Holds one wake-up time per key in a heap and calls callback(key) from a
+    # background task once it is due. Scheduling a key again replaces its
+    # time; the old heap entry is skipped when it reaches the top.
+    def __init__(self, callback):
+        self.callback = callback
+        self.heap: list[tuple[float, int, Any]] = []
+        self.due: dict[Any, float] = {}
+        self.counter = itertools.count()
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def schedule(self, key, delay):
+        when = time.monotonic() + delay
+        self.due[key] = when
+        heapq.heappush(self.heap, (when, next(self.counter), key))
+
+        # Replaced entries pile up for busy keys, drop them now and then
+        if len(self.heap) > 2 * len(self.due) + 64:
+            self.heap = [(when, next(self.counter), key) for key, when in self.due.items()]
+            heapq.heapify(self.heap)
+
+        # Only an earlier first deadline changes how long run() sleeps
+        if self.heap[0][0] == when:
+            self.wake.set()
+
+    def cancel(self, key):
+        self.due.pop(key, None)
+
+    def is_scheduled(self, key):
+        return key in self.due
+
+    def pop_due(self, now):
+        keys = []
+        while self.heap and self.heap[0][0] <= now:
+            when, _, key = heapq.heappop(self.heap)
+            if self.due.get(key) == when:
+                del self.due[key]
+                keys.append(key)
+
+        return keys
+
+    def next_delay(self):
+        while self.heap:
+            when, _, key = self.heap[0]
+            if self.due.get(key) == when:
+                return max(when - time.monotonic(), 0)
+            heapq.heappop(self.heap)
+
+        return None
+
+    async def run(self):
+        while True:
+            self.wake.clear()
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=self.next_delay())
+            except asyncio.TimeoutError:
+                pass
+
+            for key in self.pop_due(time.monotonic()):
+                try:
+                    await self.callback(key)
+                except Exception as error:
+                    print(f"Scheduled event for {key!r} failed: {error!r}")
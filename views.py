@@ -1,35 +1,57 @@
 import discord
-from functools import partial
+
+
+class GameButton(discord.ui.DynamicItem[discord.ui.Button], template=r'game:(?P<user_id>\d+):(?P<action>[a-z]+):(?P<page>\d+)(?::(?P<target_id>\d+))?'):
+    # Every game button. Whose menu it is, what it does, the page and the
+    # upgrade or activity id all live in the custom_id, so discord.py keeps
+    # nothing per message and the buttons still work after a restart.
+    # Registered once with bot.add_dynamic_items in setup().
+    def __init__(self, user_id, action, page=1, target_id=None, label=None, style=discord.ButtonStyle.primary, row=None):
+        custom_id = f'game:{user_id}:{action}:{page}' + (f':{target_id}' if target_id is not None else '')
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=custom_id), row=row)
+        self.user_id = user_id
+        self.action = action
+        self.page = page
+        self.target_id = target_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        target_id = match['target_id']
+        return cls(int(match['user_id']), match['action'], int(match['page']), int(target_id) if target_id else None)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.user_id
+
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog('IncrementalGameCog')
+        if cog:
+            await cog.dispatch_button(interaction, self.action, self.page, self.target_id)
 
 
 class BaseView(discord.ui.View):
+    # Only built to be sent, see GameButton. Stopped right away: discord.py
+    # doesn't store a finished view for its message, and the clicks reach
+    # the registered GameButton template anyway.
     def __init__(self, cog, user_id):
         super().__init__(timeout=None)
         self.cog = cog
         self.user_id = user_id
+        self.stop()
 
-    def is_owner(self, interaction: discord.Interaction) -> bool:
-        return interaction.user.id == self.user_id
+    def add_button(self, action, label, style=discord.ButtonStyle.primary, page=1, target_id=None, row=None):
+        self.add_item(GameButton(self.user_id, action, page, target_id, label=label, style=style, row=row))
 
-    def add_back_button(self, callback, row=2):
-        back_button = discord.ui.Button(label='Back', style=discord.ButtonStyle.primary, row=row)
-        back_button.callback = callback
-        self.add_item(back_button)
+    def add_back_button(self, row=2):
+        self.add_button('main', 'Back', row=row)
 
-    def add_update_button(self, callback, row=3):
-        update_button = discord.ui.Button(label='Update', style=discord.ButtonStyle.secondary, row=row)
-        update_button.callback = callback
-        self.add_item(update_button)
+    def add_update_button(self, action, page=1, row=3):
+        self.add_button(action, 'Update', style=discord.ButtonStyle.secondary, page=page, row=row)
 
-    def add_previous_button(self, callback, row=2):
-        previous_button = discord.ui.Button(label='⬅️', style=discord.ButtonStyle.primary, row=row)
-        previous_button.callback = callback
-        self.add_item(previous_button)
+    def add_previous_button(self, action, page, row=2):
+        self.add_button(action, '⬅️', page=page - 1, row=row)
 
-    def add_next_button(self, callback, row=2):
-        next_button = discord.ui.Button(label='➡️', style=discord.ButtonStyle.primary, row=row)
-        next_button.callback = callback
-        self.add_item(next_button)
+    def add_next_button(self, action, page, row=2):
+        self.add_button(action, '➡️', page=page + 1, row=row)
 
 
 class MainMenuView(BaseView):
@@ -41,24 +63,18 @@ class MainMenuView(BaseView):
         self.clear_items()
 
         # Activities button
-        activities_button = discord.ui.Button(label='Activities', style=discord.ButtonStyle.primary)
-        activities_button.callback = self.cog.activities_menu_callback
-        self.add_item(activities_button)
+        self.add_button('activities', 'Activities')
 
         # Shop button
-        shop_button = discord.ui.Button(label='Shop', style=discord.ButtonStyle.primary)
-        shop_button.callback = self.cog.shop_menu_callback
-        self.add_item(shop_button)
+        self.add_button('shop', 'Shop')
 
         # Update button
-        self.add_update_button(self.cog.main_menu_callback)
+        self.add_update_button('main')
 
     def create_register_menu(self):
         self.clear_items()
 
-        register_button = discord.ui.Button(label='Register', style=discord.ButtonStyle.success)
-        register_button.callback = self.cog.register_callback
-        self.add_item(register_button)
+        self.add_button('register', 'Register', style=discord.ButtonStyle.success)
 
 
 class ShopMenuView(BaseView):
@@ -70,33 +86,23 @@ class ShopMenuView(BaseView):
 
     def create_shop_menu(self, player, upgrades_per_page, page=1):
         self.clear_items()
-        missing_upgrades = self.cog.get_missing_upgrades(player)
-        upgrades_count = 0
-        for upgrade, _ in missing_upgrades:
-            if not self.cog.check_conditions(player, upgrade.unlock_conditions):
-                continue
-            upgrades_count += 1
-            start_index = (page - 1) * upgrades_per_page
-            end_index = page * upgrades_per_page
-
-            if start_index < upgrades_count <= end_index:
-                currency = next((c for c in player.currencies.values() if c.name == upgrade.cost_material), None)
-                button_style = discord.ButtonStyle.success if currency and currency.amount >= upgrade.cost else discord.ButtonStyle.secondary
-                buy_button = discord.ui.Button(label=f'Buy {upgrade.name}', style=button_style)
-                buy_button.callback = partial(self.cog.buy_upgrade_callback, upgrade=upgrade)
-                self.add_item(buy_button)
-
-        # Back and Update buttons
-        self.add_update_button(self.cog.shop_menu_callback)
-        self.add_back_button(self.cog.main_menu_callback)
+        shop_state = self.cog.get_shop_state(player)
+        upgrades_count = len(shop_state.entries)
+        for upgrade, _ in shop_state.page(page, upgrades_per_page):
+            currency = player.currencies_by_name.get(upgrade.cost_material.lower())
+            button_style = discord.ButtonStyle.success if currency and currency.amount >= upgrade.cost else discord.ButtonStyle.secondary
+            self.add_button('buy', f'Buy {upgrade.name}', style=button_style, page=page, target_id=upgrade.id)
+
+        # Back and Update buttons. Update stays on this page: a message can't
+        # have two buttons with the same custom_id as the previous page's.
+        self.add_update_button('shop', page)
+        self.add_back_button()
 
         if upgrades_count > upgrades_per_page:
-            previous_button_callback = partial(self.cog.shop_menu_callback, page=page-1)
-            next_button_callback = partial(self.cog.shop_menu_callback, page=page+1)
             if page > 1:
-                self.add_previous_button(previous_button_callback)
+                self.add_previous_button('shop', page)
             if page * upgrades_per_page < upgrades_count:
-                self.add_next_button(next_button_callback)
+                self.add_next_button('shop', page)
 
 
 class ActivitiesMenuView(BaseView):
@@ -107,39 +113,27 @@ class ActivitiesMenuView(BaseView):
     def create_activities_menu(self, player, activities_per_page, page=1):
         self.clear_items()
 
-        activities = self.cog.get_available_activities(player)
-
-        activities_count = 0
-
-        for activity in activities:
-            activities_count += 1
-
-            start_index = (page - 1) * activities_per_page
-            end_index = page * activities_per_page
+        activities_state = self.cog.get_activities_state(player)
+        activities_count = len(activities_state.entries)
 
-            if start_index < activities_count <= end_index:
-                button_style = discord.ButtonStyle.success if player.current_activity and player.current_activity.id == activity.id else discord.ButtonStyle.primary
-                activity_button = discord.ui.Button(label=f'{activity.name}', style=button_style)
-                activity_button.callback = partial(self.cog.start_activity_callback, activity=activity)
-                self.add_item(activity_button)
+        for activity in activities_state.page(page, activities_per_page):
+            button_style = discord.ButtonStyle.success if player.current_activity and player.current_activity.id == activity.id else discord.ButtonStyle.primary
+            self.add_button('start', f'{activity.name}', style=button_style, page=page, target_id=activity.id)
 
         if player.current_activity:
             stop_button_style = discord.ButtonStyle.danger
         else:
             stop_button_style = discord.ButtonStyle.secondary
 
-        stop_activity_button = discord.ui.Button(label=f'Stop', style=stop_button_style, row=1)
-        stop_activity_button.callback = partial(self.cog.start_activity_callback, activity=None)
-        self.add_item(stop_activity_button)
+        # Starting no activity stops the current one
+        self.add_button('start', 'Stop', style=stop_button_style, page=page, row=1)
 
         # Back and Update buttons
-        # self.add_update_button(self.cog.activities_menu_callback)
-        self.add_back_button(self.cog.main_menu_callback)
+        # self.add_update_button('activities', page)
+        self.add_back_button()
 
         if activities_count > activities_per_page:
-            previous_button_callback = partial(self.cog.activities_menu_callback, page=page-1)
-            next_button_callback = partial(self.cog.activities_menu_callback, page=page+1)
             if page > 1:
-                self.add_previous_button(previous_button_callback)
+                self.add_previous_button('activities', page)
             if page * activities_per_page < activities_count:
-                self.add_next_button(next_button_callback)
+                self.add_next_button('activities', page)